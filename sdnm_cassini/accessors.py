@@ -0,0 +1,353 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+"""
+Typed accessors of the OpenConfig leaves used by the dataplane.
+
+Generated by "python -m sdnm_cassini.yanggen" from the modules in
+docker/odtn/yang/openconfig-odtn, do not edit.
+"""
+
+import re
+
+from sdnm_cassini.utils import iter_items, value_of
+
+
+def _decode(val, accessor):
+    if accessor is None:
+        return value_of(val)
+    return getattr(val.data(), accessor)()
+
+
+CHANNEL = "/openconfig-terminal-device:terminal-device/logical-channels/channel[index='{}']"
+CHANNEL_ANY = "/openconfig-terminal-device:terminal-device/logical-channels/channel"
+CHANNEL_ALL = CHANNEL_ANY + "//*"
+_CHANNEL_LEAF = re.compile(r"/openconfig\-terminal\-device:terminal\-device/logical\-channels/channel\[index='([^']*)'\](?:/(.*))?$")
+CHANNEL_LEAVES = {
+    "config/index": ("config_index", "get_uint32"),
+    "config/description": ("config_description", "get_string"),
+    "config/admin-state": ("config_admin_state", "get_enum"),
+    "config/rate-class": ("config_rate_class", "get_identityref"),
+    "config/trib-protocol": ("config_trib_protocol", "get_identityref"),
+    "config/logical-channel-type": ("config_logical_channel_type", "get_identityref"),
+    "config/loopback-mode": ("config_loopback_mode", "get_enum"),
+    "config/test-signal": ("config_test_signal", "get_bool"),
+    "ingress/config/transceiver": ("ingress_config_transceiver", "get_string"),
+}
+
+
+def get_channel_config_index(session, channel):
+    val = session.get_item((CHANNEL + "/config/index").format(channel))
+    return None if val is None else val.data().get_uint32()
+
+
+def get_channel_config_description(session, channel):
+    val = session.get_item((CHANNEL + "/config/description").format(channel))
+    return None if val is None else val.data().get_string()
+
+
+def get_channel_config_admin_state(session, channel):
+    val = session.get_item((CHANNEL + "/config/admin-state").format(channel))
+    return None if val is None else val.data().get_enum()
+
+
+def get_channel_config_rate_class(session, channel):
+    val = session.get_item((CHANNEL + "/config/rate-class").format(channel))
+    return None if val is None else val.data().get_identityref()
+
+
+def get_channel_config_trib_protocol(session, channel):
+    val = session.get_item((CHANNEL + "/config/trib-protocol").format(channel))
+    return None if val is None else val.data().get_identityref()
+
+
+def get_channel_config_logical_channel_type(session, channel):
+    val = session.get_item((CHANNEL + "/config/logical-channel-type").format(channel))
+    return None if val is None else val.data().get_identityref()
+
+
+def get_channel_config_loopback_mode(session, channel):
+    val = session.get_item((CHANNEL + "/config/loopback-mode").format(channel))
+    return None if val is None else val.data().get_enum()
+
+
+def get_channel_config_test_signal(session, channel):
+    val = session.get_item((CHANNEL + "/config/test-signal").format(channel))
+    return None if val is None else val.data().get_bool()
+
+
+def get_channel_ingress_config_transceiver(session, channel):
+    val = session.get_item((CHANNEL + "/ingress/config/transceiver").format(channel))
+    return None if val is None else val.data().get_string()
+
+
+def decode_channel(val):
+    """
+    Returns (key, field, value) of a leaf of the channel entries, None for
+    the other nodes. The key is index.
+    """
+    m = _CHANNEL_LEAF.search(val.xpath())
+    if m is None or m.group(2) not in CHANNEL_LEAVES:
+        return None
+    field, accessor = CHANNEL_LEAVES[m.group(2)]
+    return int(m.group(1)), field, _decode(val, accessor)
+
+
+def read_channel(session, xpath=CHANNEL_ALL):
+    """
+    Leaves of every channel matched by xpath with one streamed query, keyed by
+    index.
+    """
+    ret = {}
+    for v in iter_items(session, xpath):
+        found = decode_channel(v)
+        if found is not None:
+            ret.setdefault(found[0], {})[found[1]] = found[2]
+    return ret
+
+
+ASSIGNMENT = "/openconfig-terminal-device:terminal-device/logical-channels/channel[index='{}']/logical-channel-assignments/assignment[index='{}']"
+ASSIGNMENT_ANY = "/openconfig-terminal-device:terminal-device/logical-channels/channel/logical-channel-assignments/assignment"
+ASSIGNMENT_ALL = ASSIGNMENT_ANY + "//*"
+_ASSIGNMENT_LEAF = re.compile(r"/openconfig\-terminal\-device:terminal\-device/logical\-channels/channel\[index='([^']*)'\]/logical\-channel\-assignments/assignment\[index='([^']*)'\](?:/(.*))?$")
+ASSIGNMENT_LEAVES = {
+    "config/index": ("config_index", "get_uint32"),
+    "config/description": ("config_description", "get_string"),
+    "config/assignment-type": ("config_assignment_type", "get_enum"),
+    "config/logical-channel": ("config_logical_channel", "get_uint32"),
+    "config/optical-channel": ("config_optical_channel", "get_string"),
+    "config/allocation": ("config_allocation", "get_decimal64"),
+}
+
+
+def get_assignment_config_index(session, channel, assignment):
+    val = session.get_item((ASSIGNMENT + "/config/index").format(channel, assignment))
+    return None if val is None else val.data().get_uint32()
+
+
+def get_assignment_config_description(session, channel, assignment):
+    val = session.get_item((ASSIGNMENT + "/config/description").format(channel, assignment))
+    return None if val is None else val.data().get_string()
+
+
+def get_assignment_config_assignment_type(session, channel, assignment):
+    val = session.get_item((ASSIGNMENT + "/config/assignment-type").format(channel, assignment))
+    return None if val is None else val.data().get_enum()
+
+
+def get_assignment_config_logical_channel(session, channel, assignment):
+    val = session.get_item((ASSIGNMENT + "/config/logical-channel").format(channel, assignment))
+    return None if val is None else val.data().get_uint32()
+
+
+def get_assignment_config_optical_channel(session, channel, assignment):
+    val = session.get_item((ASSIGNMENT + "/config/optical-channel").format(channel, assignment))
+    return None if val is None else val.data().get_string()
+
+
+def get_assignment_config_allocation(session, channel, assignment):
+    val = session.get_item((ASSIGNMENT + "/config/allocation").format(channel, assignment))
+    return None if val is None else val.data().get_decimal64()
+
+
+def decode_assignment(val):
+    """
+    Returns (key, field, value) of a leaf of the assignment entries, None for
+    the other nodes. The key is (channel, assignment).
+    """
+    m = _ASSIGNMENT_LEAF.search(val.xpath())
+    if m is None or m.group(3) not in ASSIGNMENT_LEAVES:
+        return None
+    field, accessor = ASSIGNMENT_LEAVES[m.group(3)]
+    return (int(m.group(1)), int(m.group(2))), field, _decode(val, accessor)
+
+
+def read_assignment(session, xpath=ASSIGNMENT_ALL):
+    """
+    Leaves of every assignment matched by xpath with one streamed query, keyed by
+    (channel, assignment).
+    """
+    ret = {}
+    for v in iter_items(session, xpath):
+        found = decode_assignment(v)
+        if found is not None:
+            ret.setdefault(found[0], {})[found[1]] = found[2]
+    return ret
+
+
+COMPONENT = "/openconfig-platform:components/component[name='{}']"
+COMPONENT_ANY = "/openconfig-platform:components/component"
+COMPONENT_ALL = COMPONENT_ANY + "//*"
+_COMPONENT_LEAF = re.compile(r"/openconfig\-platform:components/component\[name='([^']*)'\](?:/(.*))?$")
+COMPONENT_LEAVES = {
+    "config/name": ("config_name", "get_string"),
+    "state/name": ("state_name", "get_string"),
+    "state/type": ("state_type", None),
+    "state/id": ("state_id", "get_string"),
+    "state/description": ("state_description", "get_string"),
+    "state/mfg-name": ("state_mfg_name", "get_string"),
+    "state/mfg-date": ("state_mfg_date", "get_string"),
+    "state/hardware-version": ("state_hardware_version", "get_string"),
+    "state/firmware-version": ("state_firmware_version", "get_string"),
+    "state/software-version": ("state_software_version", "get_string"),
+    "state/serial-no": ("state_serial_no", "get_string"),
+    "state/part-no": ("state_part_no", "get_string"),
+    "state/removable": ("state_removable", "get_bool"),
+    "state/oper-status": ("state_oper_status", "get_identityref"),
+    "state/empty": ("state_empty", "get_bool"),
+    "state/parent": ("state_parent", "get_string"),
+    "state/allocated-power": ("state_allocated_power", "get_uint32"),
+    "state/used-power": ("state_used_power", "get_uint32"),
+    "openconfig-terminal-device:optical-channel/config/frequency": ("optical_channel_config_frequency", "get_uint64"),
+    "openconfig-terminal-device:optical-channel/config/target-output-power": ("optical_channel_config_target_output_power", "get_decimal64"),
+    "openconfig-terminal-device:optical-channel/config/operational-mode": ("optical_channel_config_operational_mode", "get_uint16"),
+    "openconfig-terminal-device:optical-channel/config/line-port": ("optical_channel_config_line_port", "get_string"),
+}
+
+
+def get_component_config_name(session, component):
+    val = session.get_item((COMPONENT + "/config/name").format(component))
+    return None if val is None else val.data().get_string()
+
+
+def get_component_state_name(session, component):
+    val = session.get_item((COMPONENT + "/state/name").format(component))
+    return None if val is None else val.data().get_string()
+
+
+def get_component_state_type(session, component):
+    val = session.get_item((COMPONENT + "/state/type").format(component))
+    return None if val is None else value_of(val)
+
+
+def get_component_state_id(session, component):
+    val = session.get_item((COMPONENT + "/state/id").format(component))
+    return None if val is None else val.data().get_string()
+
+
+def get_component_state_description(session, component):
+    val = session.get_item((COMPONENT + "/state/description").format(component))
+    return None if val is None else val.data().get_string()
+
+
+def get_component_state_mfg_name(session, component):
+    val = session.get_item((COMPONENT + "/state/mfg-name").format(component))
+    return None if val is None else val.data().get_string()
+
+
+def get_component_state_mfg_date(session, component):
+    val = session.get_item((COMPONENT + "/state/mfg-date").format(component))
+    return None if val is None else val.data().get_string()
+
+
+def get_component_state_hardware_version(session, component):
+    val = session.get_item((COMPONENT + "/state/hardware-version").format(component))
+    return None if val is None else val.data().get_string()
+
+
+def get_component_state_firmware_version(session, component):
+    val = session.get_item((COMPONENT + "/state/firmware-version").format(component))
+    return None if val is None else val.data().get_string()
+
+
+def get_component_state_software_version(session, component):
+    val = session.get_item((COMPONENT + "/state/software-version").format(component))
+    return None if val is None else val.data().get_string()
+
+
+def get_component_state_serial_no(session, component):
+    val = session.get_item((COMPONENT + "/state/serial-no").format(component))
+    return None if val is None else val.data().get_string()
+
+
+def get_component_state_part_no(session, component):
+    val = session.get_item((COMPONENT + "/state/part-no").format(component))
+    return None if val is None else val.data().get_string()
+
+
+def get_component_state_removable(session, component):
+    val = session.get_item((COMPONENT + "/state/removable").format(component))
+    return None if val is None else val.data().get_bool()
+
+
+def get_component_state_oper_status(session, component):
+    val = session.get_item((COMPONENT + "/state/oper-status").format(component))
+    return None if val is None else val.data().get_identityref()
+
+
+def get_component_state_empty(session, component):
+    val = session.get_item((COMPONENT + "/state/empty").format(component))
+    return None if val is None else val.data().get_bool()
+
+
+def get_component_state_parent(session, component):
+    val = session.get_item((COMPONENT + "/state/parent").format(component))
+    return None if val is None else val.data().get_string()
+
+
+def get_component_state_allocated_power(session, component):
+    val = session.get_item((COMPONENT + "/state/allocated-power").format(component))
+    return None if val is None else val.data().get_uint32()
+
+
+def get_component_state_used_power(session, component):
+    val = session.get_item((COMPONENT + "/state/used-power").format(component))
+    return None if val is None else val.data().get_uint32()
+
+
+def get_component_optical_channel_config_frequency(session, component):
+    val = session.get_item((COMPONENT + "/openconfig-terminal-device:optical-channel/config/frequency").format(component))
+    return None if val is None else val.data().get_uint64()
+
+
+def get_component_optical_channel_config_target_output_power(session, component):
+    val = session.get_item((COMPONENT + "/openconfig-terminal-device:optical-channel/config/target-output-power").format(component))
+    return None if val is None else val.data().get_decimal64()
+
+
+def get_component_optical_channel_config_operational_mode(session, component):
+    val = session.get_item((COMPONENT + "/openconfig-terminal-device:optical-channel/config/operational-mode").format(component))
+    return None if val is None else val.data().get_uint16()
+
+
+def get_component_optical_channel_config_line_port(session, component):
+    val = session.get_item((COMPONENT + "/openconfig-terminal-device:optical-channel/config/line-port").format(component))
+    return None if val is None else val.data().get_string()
+
+
+def decode_component(val):
+    """
+    Returns (key, field, value) of a leaf of the component entries, None for
+    the other nodes. The key is name.
+    """
+    m = _COMPONENT_LEAF.search(val.xpath())
+    if m is None or m.group(2) not in COMPONENT_LEAVES:
+        return None
+    field, accessor = COMPONENT_LEAVES[m.group(2)]
+    return m.group(1), field, _decode(val, accessor)
+
+
+def read_component(session, xpath=COMPONENT_ALL):
+    """
+    Leaves of every component matched by xpath with one streamed query, keyed by
+    name.
+    """
+    ret = {}
+    for v in iter_items(session, xpath):
+        found = decode_component(v)
+        if found is not None:
+            ret.setdefault(found[0], {})[found[1]] = found[2]
+    return ret
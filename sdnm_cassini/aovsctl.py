@@ -0,0 +1,202 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+"""
+asyncio variant of ovsctl: the same commands run as asyncio subprocesses and at
+most CONCURRENCY ovs-vsctl processes are alive at the same time.
+
+It covers the writes and the reads of the startup reconciliation, the trunk
+index helpers of ovsctl are not provided since they keep their state in the
+calling thread.
+"""
+
+import asyncio
+import os
+
+from sdnm_cassini import metrics, ovsctl
+
+# 0 keeps the dataplane startup sequential, aovsctl then runs one process at a time
+CONCURRENCY = int(os.environ.get("CASSINI_OVS_CONCURRENCY", "0"))
+
+_sem = None
+
+
+def set_concurrency(limit):
+    global CONCURRENCY, _sem
+    if limit < 1:
+        raise ValueError("concurrency limit must be at least 1")
+    CONCURRENCY = limit
+    _sem = None
+
+
+def _semaphore():
+    # a semaphore belongs to the loop that first uses it
+    global _sem
+    loop = asyncio.get_event_loop()
+    if _sem is None or _sem[0] is not loop:
+        _sem = (loop, asyncio.Semaphore(max(CONCURRENCY, 1)))
+    return _sem[1]
+
+
+async def _run_command(cmd):
+    async with _semaphore():
+        with metrics.timed(metrics.command_verb(cmd), forks=1):
+            proc = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE,
+                                                        stderr=asyncio.subprocess.PIPE)
+            out, err = await proc.communicate()
+            if proc.returncode > 0:
+                raise RuntimeError(err.decode("utf-8"))
+    return out.decode("utf-8")
+
+
+async def _vsctl_cmd(cmd):
+    cmd = [ovsctl.VSCTL_CMD] + cmd
+    return await _run_command(cmd)
+
+
+class Transaction(ovsctl.Transaction):
+    """
+    ovsctl.Transaction whose commit is a coroutine, use "async with".
+    """
+
+    def __enter__(self):
+        raise TypeError("use 'async with' on an asynchronous transaction")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            await self.commit()
+        else:
+            self.cmds = []
+        return False
+
+    async def commit(self):
+        if len(self.cmds) == 0:
+            return None
+        cmd = []
+        for c in self.cmds:
+            cmd += ["--"] + c
+        self.cmds = []
+        return await _vsctl_cmd(cmd)
+
+
+async def add_bridge(name):
+    return await Transaction().add_bridge(name).commit()
+
+
+async def del_bridge(name):
+    return await Transaction().del_bridge(name).commit()
+
+
+async def add_port(name, port):
+    return await Transaction().add_port(name, port).commit()
+
+
+async def del_port(name, port):
+    return await Transaction().del_port(name, port).commit()
+
+
+async def set_port_num(port, num):
+    return await Transaction().set_port_num(port, num).commit()
+
+
+async def set_type_port(port, type):
+    return await Transaction().set_type_port(port, type).commit()
+
+
+async def set_peer_port(port, peer):
+    return await Transaction().set_peer_port(port, peer).commit()
+
+
+async def set_vlan_port(port, freq):
+    return await Transaction().set_vlan_port(port, freq).commit()
+
+
+async def rem_vlan_port(port, freq):
+    return await Transaction().rem_vlan_port(port, freq).commit()
+
+
+async def clear_vlan_port(port):
+    return await Transaction().clear_vlan_port(port).commit()
+
+
+async def set_trunk_port(trunk, tags):
+    return await Transaction().set_trunk_port(trunk, tags).commit()
+
+
+async def add_port_patch(name, port, num_port, peer=None):
+    try:
+        return await Transaction().add_port_patch(name, port, num_port, peer).commit()
+    except Exception as ex:
+        raise RuntimeError(ex.__str__())
+
+
+async def get_ports(br):
+    p = await _vsctl_cmd(["list-ports", br])
+    return p.split()
+
+
+async def is_trunk(port):
+    ret = await _vsctl_cmd(["get", "port", port, "trunk"])
+    r = ret.replace("\n", "")
+    if r == "[]":
+        return False
+    return True
+
+
+async def get_tag_port(port):
+    return await _vsctl_cmd(["get", "port", port, "tag"])
+
+
+async def get_trunks_port(port):
+    return ovsctl._trunks_of(await _vsctl_cmd(["get", "port", port, "trunks"]))
+
+
+async def port_to_br(port):
+    br = await _vsctl_cmd(["port-to-br", port])
+    return br.strip()
+
+
+async def get_tables():
+    return ovsctl._tables_of(await _vsctl_cmd(ovsctl.TABLES_CMD))
+
+
+async def list_bridges():
+    v = await _vsctl_cmd(["list-br"])
+    return v.split()
+
+
+async def exist_bridge(name):
+    brs = await list_bridges()
+    return name in brs
+
+
+async def gather(aws):
+    """
+    Runs the awaitables concurrently and returns their results in order,
+    exceptions are returned in place of the result instead of raised.
+    """
+    return await asyncio.gather(*aws, return_exceptions=True)
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
@@ -0,0 +1,197 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+"""
+Asynchronous application of change sets.
+
+The sysrepo callback validates an edit, hands its ChangeSet to submit() and
+returns, and a worker thread commits it to OVS. Every submitted change set gets
+a ticket whose state, queued, applied or failed, tells when the change reached
+the datapath.
+
+Work is spread over a fixed number of lanes, each a bounded queue drained by
+its own thread. An operation goes to the lane its key hashes to, so operations
+on the same port or bridge run in submission order and the others run in
+parallel. An operation on keys of several lanes is a barrier: it runs once every
+one of those lanes has reached it, and none of them moves on before it is done.
+"""
+
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from sdnm_cassini import init_logger as log
+from sdnm_cassini import metrics
+
+QUEUED = "queued"
+APPLIED = "applied"
+FAILED = "failed"
+
+
+class Applier(object):
+    """
+    Ordered lanes of operations. submit() and execute() block while a lane
+    they post to is full, so a burst of edits slows the callbacks down instead
+    of growing without limit. key(port) maps the ports of a change set to
+    the key that picks their lane, the port itself by default. The state of the
+    last history tickets is kept.
+    """
+
+    def __init__(self, lanes=1, size=64, key=None, history=1024):
+        self.logger = log("Applier")
+        self.key = key
+        self.history = history
+        self.states = OrderedDict()
+        self.errors = {}
+        self.seq = 0
+        self.cond = threading.Condition()
+        # keeps barriers in the same order on every lane they are posted to
+        self.post_lock = threading.Lock()
+        self.lanes = []
+        self.threads = []
+        for i in range(lanes):
+            q = queue.Queue(size)
+            t = threading.Thread(target=self._run, args=(q,), name="apply-{}".format(i))
+            t.daemon = True
+            t.start()
+            self.lanes.append(q)
+            self.threads.append(t)
+
+    def lane_of(self, key):
+        return hash(key) % len(self.lanes)
+
+    def submit(self, cs, name="changes"):
+        """
+        Queues the commit of a ChangeSet on the lanes of the ports it touches.
+        """
+        ports = cs.ports()
+        keys = ports if self.key is None else set(self.key(p) for p in ports)
+        return self.execute(keys, cs.commit, name=name)
+
+    def execute(self, keys, fn, *args, name="changes"):
+        """
+        Queues fn(*args) on the lanes of keys, all of them taking part in the
+        barrier when there is more than one. Operations without keys go to the
+        first lane. Returns the ticket of the operation.
+        """
+        return self._post(set(self.lane_of(k) for k in keys) or {0}, name, fn, args)
+
+    def _post(self, lanes, name, fn, args):
+        with self.cond:
+            self.seq += 1
+            ticket = self.seq
+            self._set(ticket, QUEUED)
+        op = (ticket, name, fn, args, time.monotonic())
+        if len(lanes) == 1:
+            self.lanes[lanes.pop()].put((op, None))
+            return ticket
+        barrier = threading.Barrier(len(lanes), action=lambda: self._apply(*op))
+        with self.post_lock:
+            for i in sorted(lanes):
+                self.lanes[i].put((op, barrier))
+        return ticket
+
+    def _set(self, ticket, state, error=None):
+        self.states[ticket] = state
+        if error is not None:
+            self.errors[ticket] = error
+        while len(self.states) > self.history:
+            old, s = next(iter(self.states.items()))
+            if s == QUEUED:
+                break
+            del self.states[old]
+            self.errors.pop(old, None)
+
+    def _run(self, q):
+        while True:
+            item = q.get()
+            if item is None:
+                q.task_done()
+                return
+            op, barrier = item
+            if barrier is None:
+                self._apply(*op)
+            else:
+                # the last lane to arrive applies it, the others wait for it
+                barrier.wait()
+            q.task_done()
+
+    def _apply(self, ticket, name, fn, args, queued):
+        metrics.REGISTRY.observe("apply-wait {}".format(name), time.monotonic() - queued)
+        state = APPLIED
+        error = None
+        try:
+            with metrics.timed("apply {}".format(name)):
+                fn(*args)
+            self.logger.info("changes {} of {} reached the datapath".format(ticket, name))
+        except Exception as ex:
+            state = FAILED
+            error = ex
+            self.logger.error("changes {} of {} were not applied: {}".format(ticket, name, ex))
+        with self.cond:
+            self._set(ticket, state, error)
+            self.cond.notify_all()
+
+    def status(self, ticket):
+        """
+        State of ticket, or None for tickets that are unknown or too old.
+        """
+        with self.cond:
+            return self.states.get(ticket)
+
+    def error(self, ticket):
+        with self.cond:
+            return self.errors.get(ticket)
+
+    def pending(self):
+        with self.cond:
+            return sum(1 for s in self.states.values() if s == QUEUED)
+
+    def wait(self, ticket, timeout=None):
+        """
+        Waits for ticket to leave the queue and returns its state, which is
+        still queued if timeout expires first.
+        """
+        with self.cond:
+            self.cond.wait_for(lambda: self.states.get(ticket) != QUEUED, timeout)
+            return self.states.get(ticket)
+
+    def barrier(self, keys=None, timeout=None):
+        """
+        Waits until everything queued so far on the lanes of keys, or on every
+        lane when keys is None, was applied. Returns False on timeout.
+        """
+        if keys is None:
+            lanes = set(range(len(self.lanes)))
+        else:
+            lanes = set(self.lane_of(k) for k in keys) or {0}
+        ticket = self._post(lanes, "barrier", lambda: None, ())
+        return self.wait(ticket, timeout) != QUEUED
+
+    def join(self):
+        """
+        Returns once every operation submitted so far was applied.
+        """
+        for q in self.lanes:
+            q.join()
+
+    def stop(self):
+        for q in self.lanes:
+            q.put(None)
+        for t in self.threads:
+            t.join()
+        self.threads = []
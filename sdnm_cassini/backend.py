@@ -0,0 +1,49 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+"""
+OVS backends used by the dataplane.
+
+A backend is any object with the ovsctl surface:
+
+- Transaction(), whose transactions offer add_bridge, del_bridge, set_fail_mode,
+  add_port, del_port, set_port_num, set_type_port, set_peer_port, set_vlan_port,
+  rem_vlan_port, clear_vlan_port, set_trunk_port, add_trunk_tag, rem_trunk_tag,
+  add_port_patch and commit();
+- the same write operations as one-shot calls;
+- the reads get_ports, is_trunk, get_tag_port, get_trunks_port, get_trunk_ports,
+  get_tags_br, port_to_br, list_bridges, exist_bridge and get_tables;
+- update_trunk_port and invalidate_trunks.
+
+The ovsctl (ovs-vsctl subprocess) and ovsdb (JSON-RPC) modules are backends as
+they are, SimulatedSwitch is an in-memory one.
+"""
+
+BACKENDS = ("vsctl", "ovsdb", "sim")
+
+
+def load(name="vsctl"):
+    if name == "vsctl":
+        from sdnm_cassini import ovsctl
+        return ovsctl
+    elif name == "ovsdb":
+        from sdnm_cassini import ovsdb
+        return ovsdb
+    elif name == "sim":
+        from sdnm_cassini.simswitch import SimulatedSwitch
+        return SimulatedSwitch()
+    else:
+        raise RuntimeError("unknown ovs backend {}, expected one of {}".format(name, ", ".join(BACKENDS)))
@@ -0,0 +1,221 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+"""
+Local copy of the terminal-device channels and platform components.
+
+The cache is primed with one query per module and then kept coherent by the
+module change callbacks through update(), so the handlers resolve a channel
+index to its record and a component name to its frequency without going to
+sysrepo. An entry that is missing is read again on the next access.
+
+Every channel put in or dropped from the cache also updates the reverse
+indexes: description to index and line channel to the client channels
+assigned to it.
+"""
+
+import threading
+
+import sysrepo as sr
+
+import sdnm_cassini.platform as pl
+import sdnm_cassini.terminal_device as td
+from sdnm_cassini.model import Component, OpticalChannel
+
+
+def _discard(index, key, value):
+    values = index.get(key)
+    if values is not None:
+        values.discard(value)
+        if len(values) == 0:
+            del index[key]
+
+
+class ConfigCache(object):
+
+    def __init__(self, session):
+        self.session = session
+        self.channels = {}
+        self.components = None
+        self.by_description = {}
+        self.by_line = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def subtrees():
+        """
+        Data nodes the cache follows, the channel and component lists. They
+        are the lowest subtrees holding every leaf the dataplane reads, one per
+        module, so an edit reaches one callback per module it touches.
+        """
+        return [td.CHANNEL_LIST, pl.COMPONENT_LIST]
+
+    def prime(self):
+        channels = td.get_logical_channels(self.session)
+        components = pl.get_components(self.session)
+        with self.lock:
+            self._reset(channels)
+            self.components = components
+
+    def _reset(self, channels):
+        self.channels = {}
+        self.by_description = {}
+        self.by_line = {}
+        for index, ch in channels.items():
+            self._put(index, ch)
+
+    def _put(self, index, ch):
+        self._drop(index)
+        self.channels[index] = ch
+        if ch.description is not None:
+            self.by_description[ch.description] = index
+        if ch.logical_channel:
+            self.by_line.setdefault(ch.logical_channel, set()).add(index)
+
+    def _drop(self, index):
+        ch = self.channels.pop(index, None)
+        if ch is None:
+            return
+        if self.by_description.get(ch.description) == index:
+            del self.by_description[ch.description]
+        _discard(self.by_line, ch.logical_channel, index)
+
+    def get_channels(self):
+        with self.lock:
+            return dict(self.channels)
+
+    def _components(self):
+        with self.lock:
+            components = self.components
+        if components is None:
+            components = pl.get_components(self.session)
+            with self.lock:
+                self.components = components
+        return components
+
+    def get_components(self):
+        """
+        Names of the components that are bridges, the ones without "/".
+        """
+        return [name for name in self._components() if "/" not in name]
+
+    def component(self, name):
+        return self._components().get(name)
+
+    def channel(self, index):
+        index = int(index)
+        with self.lock:
+            ch = self.channels.get(index)
+        if ch is None:
+            ch = td.get_logical_channel(self.session, index)
+            if ch is not None:
+                with self.lock:
+                    self._put(index, ch)
+        return ch
+
+    def description(self, index):
+        ch = self.channel(index)
+        return None if ch is None else ch.description
+
+    def descriptions(self, indices):
+        """
+        Descriptions of the channels in indices keyed by index, the ones not
+        cached are read with one batch query.
+        """
+        ret = {}
+        missing = []
+        with self.lock:
+            for i in indices:
+                ch = self.channels.get(int(i))
+                if ch is None:
+                    missing.append(int(i))
+                else:
+                    ret[ch.index] = ch.description
+        if len(missing) > 0:
+            ret.update(td.get_config_descriptions(self.session, missing))
+        return ret
+
+    def index_of(self, description):
+        with self.lock:
+            return self.by_description.get(description)
+
+    def clients_of(self, line):
+        with self.lock:
+            return sorted(self.by_line.get(int(line), ()))
+
+    def transceiver_of(self, description):
+        with self.lock:
+            index = self.by_description.get(description)
+            if index is None:
+                return None
+            return self.channels[index].transceiver
+
+    def frequency(self, name):
+        c = self.component(name)
+        if c is not None and c.optical_channel is not None:
+            return c.frequency
+        freq, vlan = pl.get_config_frequency_vlan(self.session, name)
+        with self.lock:
+            if self.components is not None:
+                if c is None:
+                    c = Component(name)
+                self.components[c.name] = c.replace(optical_channel=OpticalChannel(freq))
+        return freq
+
+    def update(self, change):
+        """
+        Applies a parsed sysrepo change (xpath.Change) to the cache, changes of
+        leaves the cache does not keep are ignored.
+        """
+        oper = change.oper
+        value = None if oper == sr.SR_OP_DELETED else change.new
+        with self.lock:
+            leaf = td.channel_leaf(change.xpath)
+            if leaf is not None:
+                self._update_channel(oper, leaf[0], leaf[1], value)
+                return
+            leaf = pl.component_leaf(change.xpath)
+            if leaf is not None:
+                self._update_component(oper, leaf[0], leaf[1], value)
+
+    def _update_channel(self, oper, index, field, value):
+        if field is None:
+            if oper == sr.SR_OP_DELETED:
+                self._drop(index)
+            return
+        ch = self.channels.get(index)
+        if ch is None:
+            if oper != sr.SR_OP_CREATED:
+                # not loaded, it is read on the next access
+                return
+            ch = td.new_channel(index)
+        self._put(index, ch.replace(**{field: value}))
+
+    def _update_component(self, oper, name, leaf, value):
+        if self.components is None:
+            # not loaded, it is read on the next access
+            return
+        c = self.components.get(name)
+        if leaf is None:
+            if oper == sr.SR_OP_DELETED:
+                self.components.pop(name, None)
+            elif oper == sr.SR_OP_CREATED and c is None:
+                c = Component(name)
+                self.components[c.name] = c
+        elif leaf == pl.FREQUENCY_NODE:
+            if c is None:
+                c = Component(name)
+            self.components[c.name] = c.replace(optical_channel=OpticalChannel(value))
@@ -0,0 +1,151 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+"""
+Batching of the changes of one sysrepo callback.
+
+net_changes() reduces the change set to one change per leaf instance, and a
+ChangeSet collects the OVS writes of every handler, keeping only the last write
+of each port column, and applies them as one transaction.
+"""
+
+from collections import OrderedDict
+
+import sysrepo as sr
+
+# Transaction methods that write one column of the port given as first argument
+COLUMNS = {
+    "set_peer_port": "peer",
+    "set_type_port": "type",
+    "set_port_num": "ofport",
+    "set_vlan_port": "tag",
+    "rem_vlan_port": "tag",
+    "clear_vlan_port": "tag",
+}
+
+
+def net_changes(changes):
+    """
+    Collapses xpath.Change records to their net effect per xpath: the first
+    old value and the last new value. Leaves that end where they started are
+    dropped.
+    """
+    net = OrderedDict()
+    for ch in changes:
+        first = net.get(ch.xpath)
+        if first is not None:
+            ch = ch._replace(old=first.old)
+        net[ch.xpath] = ch
+    ret = []
+    for ch in net.values():
+        if ch.old == ch.new:
+            continue
+        if ch.old is None:
+            ch = ch._replace(oper=sr.SR_OP_CREATED)
+        elif ch.new is None:
+            ch = ch._replace(oper=sr.SR_OP_DELETED)
+        else:
+            ch = ch._replace(oper=sr.SR_OP_MODIFIED)
+        ret.append(ch)
+    return ret
+
+
+class ChangeSet(object):
+    """
+    Stands in for a backend Transaction while the handlers of a change set run.
+    Column writes replace the previous write of the same port column, the other
+    methods are kept in call order. commit() sends everything in one transaction,
+    runs the deferred calls and then commits the flow plan, if any.
+
+    Nothing reaches the backend, the flow plan or the deferred callees before
+    commit(), so a change set computed for an edit that is later aborted is
+    simply dropped.
+    """
+
+    def __init__(self, backend, flows=None):
+        self.backend = backend
+        self.flows = flows
+        self.ops = OrderedDict()
+        self.after = []
+        self.touched = set()
+        self.links = OrderedDict()
+        self.seq = 0
+
+    def __getattr__(self, method):
+        if method.startswith("_"):
+            raise AttributeError(method)
+
+        def record(*args):
+            column = COLUMNS.get(method)
+            if column is not None:
+                key = (args[0], column)
+                self.ops.pop(key, None)
+            else:
+                key = self.seq
+                self.seq += 1
+            self.ops[key] = (method, args)
+            return self
+
+        return record
+
+    def defer(self, fn, *args, **kwargs):
+        self.after.append((fn, args, kwargs))
+
+    def link(self, client, line):
+        """
+        Records the line channel a client channel ends up assigned to, 0 for
+        none; the dataplane turns the links into peer writes once every change
+        of the set was handled.
+        """
+        self.links.pop(client, None)
+        self.links[client] = line
+
+    def touch(self, *ports):
+        """
+        Adds ports changed by deferred calls to ports().
+        """
+        self.touched.update(ports)
+
+    def ports(self):
+        """
+        Ports and bridges the change set writes: the first argument of every
+        Transaction call and the ports given to touch().
+        """
+        ports = set(self.touched)
+        for method, args in self.ops.values():
+            if len(args) > 0:
+                ports.add(args[0])
+        return ports
+
+    def __len__(self):
+        return len(self.ops) + len(self.after)
+
+    def commit(self):
+        ops = self.ops
+        after = self.after
+        self.ops = OrderedDict()
+        self.after = []
+        ret = None
+        if len(ops) > 0:
+            tx = self.backend.Transaction()
+            for method, args in ops.values():
+                getattr(tx, method)(*args)
+            ret = tx.commit()
+        for fn, args, kwargs in after:
+            fn(*args, **kwargs)
+        if self.flows is not None:
+            self.flows.commit()
+        return ret
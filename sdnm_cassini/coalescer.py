@@ -0,0 +1,81 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import threading
+from collections import OrderedDict
+
+from sdnm_cassini import init_logger as log
+
+
+class Coalescer(object):
+    """
+    Holds ovsctl writes per (table, row, column) for a short window and applies
+    only the last one, all pending writes going out in a single transaction.
+
+    The window starts with the first pending write, so no write waits longer
+    than window seconds. flush() applies everything now and can be used as a
+    barrier. on_apply(key, old, method, args) is called after each applied
+    write with the old value given by the first write of the window.
+    """
+
+    def __init__(self, backend, window=0.05, on_apply=None):
+        self.logger = log("Coalescer")
+        self.backend = backend
+        self.window = window
+        self.on_apply = on_apply
+        self.pending = OrderedDict()
+        self.timer = None
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+
+    def write(self, table, row, column, method, *args, old=None):
+        key = (table, row, column)
+        with self.lock:
+            prev = self.pending.pop(key, None)
+            if prev is not None:
+                old = prev[2]
+            self.pending[key] = (method, args, old)
+            if self.timer is None:
+                self.timer = threading.Timer(self.window, self._expire)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def _expire(self):
+        try:
+            self.flush()
+        except Exception as ex:
+            self.logger.error("coalesced writes were not applied: {}".format(ex))
+
+    def flush(self):
+        # flush_lock keeps concurrent flushes from reordering writes
+        with self.flush_lock:
+            with self.lock:
+                pending = self.pending
+                self.pending = OrderedDict()
+                if self.timer is not None:
+                    self.timer.cancel()
+                    self.timer = None
+            if len(pending) == 0:
+                return
+
+            tx = self.backend.Transaction()
+            for method, args, old in pending.values():
+                getattr(tx, method)(*args)
+            tx.commit()
+
+            if self.on_apply is not None:
+                for key, (method, args, old) in pending.items():
+                    self.on_apply(key, old, method, args)
@@ -13,26 +13,72 @@
 #  See the License for the specific language governing permissions and         +
 #  limitations under the License.                                              +
 # ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
-import traceback
 import sysrepo as sr
 import os
 from sdnm_cassini import init_logger as log
 from sdnm_cassini import ovsctl
-import sdnm_cassini.terminal_device as td
-import sdnm_cassini.platform as pl
+from sdnm_cassini import backend as ovs_backend
+from sdnm_cassini import aovsctl, metrics, ofctl
+from sdnm_cassini.applier import Applier
+from sdnm_cassini.cache import ConfigCache
+from sdnm_cassini.changeset import ChangeSet, net_changes
+from sdnm_cassini.coalescer import Coalescer
+from sdnm_cassini.reconciler import Reconciler
 from sdnm_cassini.utils import convert_freq_vlan
+from sdnm_cassini.xpath import parse_change
 
 
 class CassiniDataPlane(object):
     MOD_PLATAFORM = "openconfig-platform"
     MOD_TERM_DEV = "openconfig-terminal-device"
-
-    def __init__(self):
+    FREQUENCY = "/openconfig-platform:components/component/optical-channel/config/frequency"
+    ASSIGNMENT = ("/openconfig-terminal-device:terminal-device/logical-channels/channel/"
+                  "logical-channel-assignments/assignment/config/logical-channel")
+    # data path of FREQUENCY, optical-channel is augmented from the terminal device
+    FREQUENCY_XPATH = ("/openconfig-platform:components/component/"
+                       "openconfig-terminal-device:optical-channel/config/frequency")
+
+    def __init__(self, backend=None):
         self.logger = log("CassiniDataPlane")
         self.context = "CassiniDataPlane"
         self.conn = sr.Connection(self.context)
         self.sess = sr.Session(self.conn, sr.SR_DS_RUNNING)
         self.subscribe = sr.Subscribe(self.sess)
+        self.cache = ConfigCache(self.sess)
+        if backend is None:
+            backend = ovs_backend.load(os.environ.get("CASSINI_OVS_BACKEND", "vsctl"))
+        self.ovs = backend
+        # startup overlaps ovs-vsctl calls when a concurrency limit is given,
+        # aovsctl forks ovs-vsctl so it only stands in for the vsctl backend
+        self.concurrency = aovsctl.CONCURRENCY
+        if self.ovs is not ovsctl:
+            self.concurrency = 0
+        # repeated retunes of a port inside the window reach OVS only once
+        window = float(os.environ.get("CASSINI_COALESCE_WINDOW", "0"))
+        self.coalescer = None
+        if window > 0:
+            self.coalescer = Coalescer(self.ovs, window, on_apply=self.on_coalesced)
+        # in openflow mode cross-connects and vlans are flows on the xc bridge
+        self.flows = None
+        if os.environ.get("CASSINI_DATAPLANE_MODE") == "openflow":
+            self.flows = ofctl.FlowPlan()
+        # with a queue size the callbacks return once the edit is validated and
+        # the applier lanes commit it, in order per transceiver
+        size = int(os.environ.get("CASSINI_APPLY_QUEUE", "0"))
+        lanes = int(os.environ.get("CASSINI_APPLY_LANES", "1"))
+        self.applier = None
+        if size > 0:
+            self.applier = Applier(lanes=max(lanes, 1), size=size, key=self.lane_key)
+        self.metrics_interval = float(os.environ.get("CASSINI_METRICS_INTERVAL", "0"))
+        self.handlers = {}
+        # subtrees subscribed on init, edits anywhere else do not wake the dataplane
+        self.subtrees = []
+        for xpath in self.cache.subtrees():
+            self.watch(xpath)
+        # OVS plans computed on VERIFY, by subscription, waiting for APPLY
+        self.plans = {}
+        self.register_handler(self.FREQUENCY, self.update_frequency, self.FREQUENCY_XPATH)
+        self.register_handler(self.ASSIGNMENT, self.update_assignment)
 
     def print_change(self, op, old_val, new_val):
         if (op == sr.SR_OP_CREATED):
@@ -44,89 +90,158 @@ class CassiniDataPlane(object):
         elif (op == sr.SR_OP_MOVED):
             self.logger.info("MOVED: ({}) to ({})".format(old_val.xpath(), new_val.xpath()))
 
-    def get_attributes(self, xpath):
-        tmp = xpath.rsplit("/", maxsplit=3)
-        n = tmp[3].split(" = ")[0].strip()
-        v = tmp[3].split(" = ")[1].strip()
-        i = tmp[0].split("'")[1].strip()
-        return i, n, v
-
-    def reach_function(self, oper, ch):
-        def action_platform_frequency(c):
-            self.update_frequency(c[0], c[1])
-
-        def action_terminal_assignment(c):
-            self.update_assignment(c[0], c[1])
-
-        def is_frequency(c):
-            b = False
-            for f in c:
-                if f is None:
-                    pass
-                else:
-                    b = f.startswith("/openconfig-platform") and f.__contains__("/config/frequency")
-            return b
-
-        def is_logical_channel(c):
-            b = False
-            for f in c:
-                if f is None:
-                    pass
-                else:
-                    b = (f.startswith("/openconfig-terminal-device") and f.__contains__("/config/logical-channel"))
-            return b
-
-        if is_frequency(ch):
-            action_platform_frequency(ch)
-        elif is_logical_channel(ch):
-            action_terminal_assignment(ch)
+    def register_handler(self, path, handler, xpath=None):
+        """
+        Routes the changes of the schema node path (xpath.schema_path) to
+        handler, which is called with the parsed change, and subscribes to
+        them. xpath is the data path to subscribe to when path has nodes of
+        other modules, whose prefixes the schema path drops.
+        """
+        self.handlers[path] = handler
+        self.watch(path if xpath is None else xpath)
+
+    def watch(self, xpath):
+        """
+        Subscribes to the subtree of xpath unless a subscribed subtree holds
+        it; the subtrees it holds are dropped, one edit of a subtree is one
+        callback and so one OVS transaction.
+        """
+        for s in self.subtrees:
+            if xpath == s or xpath.startswith(s + "/"):
+                return
+        self.subtrees = [s for s in self.subtrees if not s.startswith(xpath + "/")]
+        self.subtrees.append(xpath)
+
+    def reach_function(self, oper, ch, cs=None):
+        handler = self.handlers.get(ch.schema)
+        if handler is None:
+            # nobody acts on this leaf
+            return False
+        if cs is None:
+            cs = ChangeSet(self.ovs, self.flows)
+            handler(ch, cs)
+            self.plan_peers(cs)
+            cs.commit()
         else:
-            self.logger.warn("module not found")
+            handler(ch, cs)
+        return True
+
+    def plan_changes(self, changes):
+        """
+        Runs the handlers of the net changes of one callback and returns their
+        OVS writes as a ChangeSet that is not committed yet. The handlers raise
+        RuntimeError on edits the dataplane cannot carry out.
+        """
+        cs = ChangeSet(self.ovs, self.flows)
+        for ch in net_changes(changes):
+            self.reach_function(ch.oper, ch, cs)
+        self.plan_peers(cs)
+        return cs
+
+    def lane_key(self, port):
+        """
+        Edits are ordered per transceiver, the bridge holding the port and the
+        trunk whose VLANs follow the port tags.
+        """
+        br = self.cache.transceiver_of(port)
+        return port if br is None else br
+
+    def apply_status(self, ticket):
+        """
+        State of a queued edit, see applier; edits applied on the callback
+        thread have no ticket.
+        """
+        if self.applier is None:
+            return None
+        return self.applier.status(ticket)
 
     def ev_to_str(self, ev):
-        if (ev == sr.SR_OP_CREATED):
-            return "CREATED"
-        elif (ev == sr.SR_OP_MODIFIED):
-            return "MODIFIED"
-        elif (ev == sr.SR_OP_DELETED):
-            return "DELETED"
-        elif (ev == sr.SR_OP_MOVED):
-            return "MOVED"
+        if (ev == sr.SR_EV_VERIFY):
+            return "VERIFY"
+        elif (ev == sr.SR_EV_APPLY):
+            return "APPLY"
+        elif (ev == sr.SR_EV_ABORT):
+            return "ABORT"
+        elif (ev == sr.SR_EV_ENABLED):
+            return "ENABLED"
         else:
             return None
 
-    def module_cb(self, sess, module_name, event, private_ctx):
-        xpath = "/" + module_name + ":*//*"
-        it = sess.get_changes_iter(xpath)
+    def subtree_cb(self, sess, xpath, event, private_ctx):
+        with metrics.timed("netconf-edit {}".format(xpath)):
+            return self.handle_changes(sess, xpath, event)
+
+    def handle_changes(self, sess, xpath, event):
+        """
+        Handles the changes of the subscribed xpath. VERIFY computes the OVS
+        plan of the edit and rejects it if the plan cannot be built, APPLY
+        commits the plan computed on VERIFY and ABORT drops it. The cache takes
+        the edit only once its plan was committed, or queued, so it keeps
+        matching OVS when APPLY fails.
+        """
         self.logger.info("New {} event reached".format(self.ev_to_str(event)))
+        if event == sr.SR_EV_ABORT:
+            if self.plans.pop(xpath, None) is not None:
+                self.logger.info("the plan of {} was discarded".format(xpath))
+            return sr.SR_ERR_OK
+
+        changes = self.read_changes(sess, xpath)
+        routed = [ch for ch in changes if ch.schema in self.handlers]
+
+        if event == sr.SR_EV_VERIFY:
+            try:
+                self.plans[xpath] = self.plan_changes(routed)
+            except Exception as ex:
+                self.plans.pop(xpath, None)
+                self.logger.error("the edit of {} was rejected: {}".format(xpath, ex))
+                return sr.SR_ERR_VALIDATION_FAILED
+
+        elif event == sr.SR_EV_APPLY:
+            plan = self.plans.pop(xpath, None)
+            if plan is None:
+                # the edit did not go through VERIFY, plan it on the cache before the edit
+                try:
+                    plan = self.plan_changes(routed)
+                except Exception as ex:
+                    self.logger.error("the edit of {} cannot be planned, it was not applied: {}".format(xpath, ex))
+                    return sr.SR_ERR_OK
+            if len(routed) > 0:
+                self.logger.info("applying {} new changes on dataplane".format(len(routed)))
+            if self.applier is not None:
+                # failures of queued plans are reported by their ticket
+                if len(plan) > 0:
+                    ticket = self.applier.submit(plan, xpath)
+                    self.logger.info("changes of {} were queued as {}".format(xpath, ticket))
+            else:
+                try:
+                    plan.commit()
+                except Exception as ex:
+                    self.logger.error("the edit of {} was not applied: {}".format(xpath, ex))
+                    return sr.SR_ERR_OK
+            for ch in changes:
+                self.cache.update(ch)
+
+        return sr.SR_ERR_OK
+
+    def read_changes(self, sess, xpath):
+        # every node of the subscribed subtree, the handlers pick theirs by schema path
+        it = sess.get_changes_iter("{}//.".format(xpath))
+        changes = []
         while True:
             try:
                 change = sess.get_change_next(it)
                 if isinstance(change, type(None)):
                     break
 
-                if not isinstance(change.old_val(), type(None)):
-                    o = str(change.old_val().to_string()).replace("\n", "")
-                else:
-                    o = None
-
-                if not isinstance(change.new_val(), type(None)):
-                    n = str(change.new_val().to_string()).replace("\n", "")
-                else:
-                    n = None
-
-                ch = (o, n)
-
-                if event == sr.SR_OP_CREATED:
-                    self.logger.info("New event was reached type CREATED")
-                elif event == sr.SR_OP_MODIFIED:
-                    self.logger.info("applying new changes on dataplane")
-                    self.reach_function(change.oper(), ch)
+                ch = parse_change(change)
+                if ch is None:
+                    continue
+                changes.append(ch)
 
             except Exception as ex:
                 print(ex)
 
-        return sr.SR_ERR_OK
+        return changes
 
     def init(self):
         self.print_banner()
@@ -141,17 +256,24 @@ class CassiniDataPlane(object):
             self.logger.info("Sysrepo was found")
 
         self.logger.info("Retrieving data of repository")
-        self.add_phy_interfaces()
-        self.add_logical_interfaces()
+        self.reconcile()
+        if self.metrics_interval > 0:
+            metrics.start_dump(self.metrics_interval, self.logger)
         self.logger.info("Registering events")
         try:
 
-            self.subscribe.module_change_subscribe(self.MOD_PLATAFORM, self.module_cb)
-            self.subscribe.module_change_subscribe(self.MOD_TERM_DEV, self.module_cb)
+            for xpath in self.subtrees:
+                self.subscribe.subtree_change_subscribe(xpath, self.subtree_cb)
             self.logger.info("Waiting events")
             sr.global_loop()
             self.logger.warning("Application exit requested, exiting.\n")
         finally:
+            if self.applier is not None:
+                self.applier.stop()
+            if self.coalescer is not None:
+                self.coalescer.flush()
+            metrics.stop_dump()
+            metrics.REGISTRY.dump(self.logger)
             self.delete_phy_interfaces()
 
     def print_banner(self):
@@ -160,187 +282,172 @@ class CassiniDataPlane(object):
         print(banner)
         print("Project: SDN-Multilayer (c) 2020 National Network for Education and Research (RNP)\n")
 
-    def add_phy_interfaces(self):
-        self.logger.info("Getting physical interfaces")
-        interfaces = pl.get_component_config_name(self.sess)
-        self.logger.info("New {} interfaces was found".format(len(interfaces)))
+    def reconcile(self):
+        self.logger.info("Reconciling dataplane with the repository")
         try:
-            for i in interfaces:
-                self.create_interface(i)
-            self.logger.info("All interfaces were created")
+            self.cache.prime()
+            ops = Reconciler(self.sess, self.ovs, self.flows, self.cache, self.concurrency).reconcile()
+            self.logger.info("{} changes were applied on dataplane".format(len(ops)))
         except Exception as ex:
             self.logger.error(ex)
 
     def delete_phy_interfaces(self):
         self.logger.info("Deleting physical interfaces")
-        interfaces = pl.get_component_config_name(self.sess)
+        interfaces = self.cache.get_components()
         self.logger.info("{} interfaces was found".format(len(interfaces)))
         try:
             for i in interfaces:
                 self.delete_interface(i)
+            if self.flows is not None:
+                self.delete_interface(self.flows.bridge)
             self.logger.info("The all interfaces were deleted")
         except Exception as ex:
             self.logger.error(ex)
 
-    def create_interface(self, name):
-        self.logger.info("Creating {} interface".format(name))
-        try:
-            ovsctl.add_bridge(name)
-            self.logger.info("Interface {} was created".format(name))
-        except Exception as ex:
-            self.logger.error(ex)
-
     def delete_interface(self, name):
         self.logger.info("Deleting ({}) interface".format(name))
         try:
-            ovsctl.del_bridge(name)
+            self.ovs.del_bridge(name)
             self.logger.info("Intupdate_fequencieserface {} was deleted".format(name))
         except Exception as ex:
             self.logger.error(ex)
 
-    def add_logical_interfaces(self):
-        self.logger.info("Creating logical interfaces")
-        interfaces = td.get_index_interfaces(self.sess)
-        for i in interfaces:
-            self.enable_logical_channel(i)
-        self.logger.info("Setting logical assignments client to line side")
-        for i in interfaces:
-            self.enable_assignments_channels(i)
-        self.logger.info("Logical interfaces was created with successful")
-
-    def enable_logical_channel(self, i):
-        desc = td.get_config_description(self.sess, i)
-        type = td.get_lch_config_assignment_type(self.sess, i)
-        self.logger.info("{}".format(type))
-        if type.__eq__("LOGICAL_CHANNEL"):
-            self.logger.info("Creating a {} {} interface".format(type, desc))
-            br = td.get_ing_config_transceiver(self.sess, i)
-            if br is not None:
-                ovsctl.add_port_patch(br, desc, i, peer="none")
-                self.logger.info(" {} {} was created".format(type, desc))
-            else:
-                raise RuntimeError("Transceiver not was found")
-        elif type.__eq__("OPTICAL_CHANNEL"):
-            self.logger.info("Creating a {} {} interface".format(type, desc))
-            br = td.get_ing_config_transceiver(self.sess, i)
-            if br is not None:
-                ovsctl.add_port_patch(br, desc, i, peer="none")
-                freq, vlan = pl.get_config_frequency_vlan(self.sess, desc)
-                self.logger.info("Mapping vlan {} as frequency {}Ghz on port {}".format(vlan, freq, desc))
-                ovsctl.set_vlan_port(desc, vlan)
-                self.logger.info("{} {} was created".format(type, desc))
-            else:
-                raise RuntimeError("Transceiver not was found")
-        else:
-            raise RuntimeError("Type assignment not found")
-
-    def enable_assignments_channels(self, i):
-        self.logger.info("Creating assignments existed")
-        name = td.get_config_description(self.sess, i)
-        type = td.get_lch_config_assignment_type(self.sess, i)
-        if type.__eq__("LOGICAL_CHANNEL"):
-            peer_idx = td.get_lch_config_logical_channel(self.sess, i)
-            if not peer_idx.__eq__("0"):
-                peer = td.get_config_description(self.sess, peer_idx)
-                ovsctl.set_peer_port(name, peer)
-                ovsctl.set_peer_port(peer, name)
-                self.logger.info("It was created new an assignment between {} and {}".format(name, peer))
-            else:
-                self.logger.info("there is no assignment to configure")
-
-        elif type.__eq__("OPTICAL_CHANNEL"):
-            self.logger.info("There is not assignment to optical interface")
-        else:
-            self.logger.info("the")
-
-    def update_frequency(self, old, new):
-        def get_values(m):
-            frq = m.rsplit("/", 3)[3].split("=")[1].strip()
-            intf = m.rsplit("/", 3)[0].split("=")[1].split("]")[0].replace("'", "")
+    def update_frequency(self, ch, cs):
+        def get_values(frq):
+            # an absent frequency is the same as 0, disabled
+            frq = 0 if frq is None else frq
+            intf = ch.keys["component"]
             vlan = convert_freq_vlan(frq)
             return frq, intf, vlan
 
-        try:
-
-            o = get_values(old)
-            n = get_values(new)
-
-            # Update
-            if not o[0].__eq__("0") and not n[0].__eq__("0"):
-                ovsctl.set_vlan_port(n[1], n[2])
-                self.logger.info("optical frequency was updated from {} to {} GHZ".format(o[0], n[0]))
-                self.logger.info("vlan dataplane was updated from {} to {}".format(o[2], n[2]))
-
-            # disable
-            elif not o[0].__eq__("0") and n[0].__eq__("0"):
-                ovsctl.rem_vlan_port(o[1], o[2])
-                self.logger.info("optical frequency {}GHZ was disabled on port {}".format(o[0], o[1]))
-
-            # enable
-            elif o[0].__eq__("0") and not n[0].__eq__("0"):
-                ovsctl.set_vlan_port(n[1], n[2])
-                self.logger.info("optical frequency was created with vlan {} and frequency {} GHZ".format(n[2], n[0]))
+        o = get_values(ch.old)
+        n = get_values(ch.new)
+        if n[0] != 0 and not 0 < n[2] < 4095:
+            raise RuntimeError("frequency {} GHZ of {} has no vlan on the dataplane".format(n[0], n[1]))
+        # ports are named after the channel descriptions
+        if (o[0] != 0 or n[0] != 0) and self.cache.index_of(n[1]) is None:
+            raise RuntimeError("component {} has no port on the dataplane".format(n[1]))
+
+        # Update
+        if o[0] != 0 and n[0] != 0:
+            self.apply_vlan(cs, n[1], n[2], o[2])
+            self.logger.info("optical frequency was updated from {} to {} GHZ".format(o[0], n[0]))
+            self.logger.info("vlan dataplane was updated from {} to {}".format(o[2], n[2]))
+
+        # disable
+        elif o[0] != 0 and n[0] == 0:
+            self.apply_vlan(cs, o[1], None, o[2])
+            self.logger.info("optical frequency {}GHZ was disabled on port {}".format(o[0], o[1]))
+
+        # enable
+        elif o[0] == 0 and n[0] != 0:
+            self.apply_vlan(cs, n[1], n[2], None)
+            self.logger.info("optical frequency was created with vlan {} and frequency {} GHZ".format(n[2], n[0]))
+        else:
+            self.logger.warn("cannot apply configuration")
+
+    def apply_vlan(self, cs, port, vlan, old):
+        # flow plan and coalescer are only touched when the change set commits
+        cs.touch(port)
+        if self.flows is not None:
+            cs.defer(self.flows.set_vlan, port, vlan)
+        elif self.coalescer is not None:
+            if vlan is None:
+                cs.defer(self.coalescer.write, "port", port, "tag", "clear_vlan_port", port, old=old)
             else:
-                self.logger.warn("cannot apply configuration")
-
-        except Exception as ex:
-            self.logger.error(ex)
-
-    def update_assignment(self, old, new):
-        def get_values(m):
-            d = m.rsplit("/", 4)[4].split(" = ")[1].strip()
-            s = m.rsplit("/", 4)[2].split("=")[1].split("]")[0].replace("'", "").strip()
-            if d.__eq__("0"):
-                dst = d
+                cs.defer(self.coalescer.write, "port", port, "tag", "set_vlan_port", port, vlan, old=old)
+        else:
+            if vlan is None:
+                cs.rem_vlan_port(port, old)
             else:
-                dst = td.get_config_description(self.sess, d)
-
-            src = td.get_config_description(self.sess, s)
-            return src, dst
-
-        def disable_log_ch(s, d):
-            ovsctl.set_peer_port(s, "none")
-            ovsctl.set_peer_port(d, "none")
-            self.logger.info("disabling logical channel: client ({}) to line ({})".format(s, d))
+                cs.set_vlan_port(port, vlan)
+            cs.defer(self.update_trunk, port, vlan, old)
 
-        def enable_log_ch(s, d):
-            ovsctl.set_peer_port(s, d)
-            ovsctl.set_peer_port(d, s)
-            self.logger.info("enabling logical channel: client ({}) to line ({})".format(s, d))
+    def on_coalesced(self, key, old, method, args):
+        vlan = args[1] if method == "set_vlan_port" else None
+        self.update_trunk(key[1], vlan, old)
 
+    def update_trunk(self, port, add, remove):
         try:
-
-            # create action
-            if isinstance(old, type(None)) and not isinstance(new, type(None)):
-                n = get_values(new)
-                enable_log_ch(n[0], n[1])
-                self.logger.info("it was created a assignment from {} to {}".format(n[0], n[1]))
-
-            # delete action
-            elif not isinstance(old, type(None)) and isinstance(new, type(None)):
-                o = get_values(old)
-                disable_log_ch(o[0], o[1])
-                self.logger.info("it was disabled a logical-channel from {} to {} ".format(o[0], o[1]))
-
-            # update action
-            elif not isinstance(old, type(None)) and not isinstance(new, type(None)):
-                o = get_values(old)
-                n = get_values(new)
-
-                if n[1] is "0":
-                    disable_log_ch(o[0], o[1])
-
-                elif o[1] is "0":
-                    enable_log_ch(n[0], n[1])
-
-                else:
-                    disable_log_ch(o[0], o[1])
-                    enable_log_ch(n[0], n[1])
-
-                self.logger.info(
-                    "it was updated a logical-channel from {}<>{} to {}<>{} ".format(o[0], o[1], n[0], n[1]))
-
+            br = self.cache.transceiver_of(port)
+            if br is None:
+                br = self.ovs.port_to_br(port)
+            self.ovs.update_trunk_port(br, add=add, remove=remove)
         except Exception as ex:
-            traceback.print_exc()
-
-
+            self.logger.warning("trunk of port {} was not updated: {}".format(port, ex))
+
+    def update_assignment(self, ch, cs):
+        s = int(ch.keys["channel"])
+        old = 0 if ch.old is None else ch.old
+        new = 0 if ch.new is None else ch.new
+        if new != 0:
+            desc = self.cache.descriptions([s, new])
+            if desc.get(s) is None:
+                raise RuntimeError("logical channel {} does not exist".format(s))
+            if desc.get(new) is None:
+                raise RuntimeError("logical channel {} does not exist".format(new))
+        # the peers are written by plan_peers once every change is known
+        cs.link(s, new)
+        if old == 0:
+            self.logger.info("it was created a assignment from {} to {}".format(s, new))
+        elif new == 0:
+            self.logger.info("it was disabled a logical-channel from {} to {} ".format(s, old))
+        else:
+            self.logger.info("it was updated a logical-channel from {}<>{} to {}<>{} ".format(s, old, s, new))
+
+    def plan_peers(self, cs):
+        """
+        Turns the assignment end state of the clients linked in cs into peer
+        writes, only for the ports whose peer changes. A line takes one client:
+        the clients linked to it take it from the ones that were there before.
+        """
+        if len(cs.links) == 0:
+            return
+        before = {}
+        for s in cs.links:
+            ch = self.cache.channel(s)
+            before[s] = 0 if ch is None or ch.logical_channel is None else ch.logical_channel
+        lines = set(before.values()) | set(cs.links.values())
+        lines.discard(0)
+        for line in lines:
+            for c in self.cache.clients_of(line):
+                before.setdefault(c, line)
+
+        after = dict(before)
+        after.update(cs.links)
+        owner = {}
+        for c, line in after.items():
+            if line != 0 and (owner.get(line) not in cs.links or c in cs.links):
+                owner[line] = c
+        for c, line in after.items():
+            if line != 0 and owner[line] != c:
+                after[c] = 0
+
+        desc = self.cache.descriptions(set(before) | lines)
+
+        def peers(assign):
+            ret = {}
+            for c, line in assign.items():
+                ret[desc.get(c)] = desc.get(line)
+            for c, line in assign.items():
+                if line != 0:
+                    ret[desc.get(line)] = desc.get(c)
+            return ret
+
+        old = peers(before)
+        new = peers(after)
+        ports = sorted(p for p in set(old) | set(new) if p is not None and old.get(p) != new.get(p))
+        if self.flows is not None:
+            clients = set(desc.get(c) for c in after)
+            cs.touch(*ports)
+            for port in ports:
+                if port in clients and new.get(port) is None:
+                    cs.defer(self.flows.disconnect, port)
+            for port in ports:
+                if port in clients and new.get(port) is not None:
+                    cs.defer(self.flows.connect, port, new[port])
+        else:
+            for port in ports:
+                cs.set_peer_port(port, "none" if new.get(port) is None else new[port])
+        for port in ports:
+            self.logger.info("peer of {} goes from {} to {}".format(port, old.get(port), new.get(port)))
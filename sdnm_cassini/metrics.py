@@ -0,0 +1,212 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+"""
+In-process registry of latency histograms and counters per OVS operation.
+
+Operations are keyed by command verb ("add-br", "set port", "list-ports",
+"ofctl add-flows", "transact update Port", ...). Each key keeps a latency
+histogram with fixed exponential buckets, so memory does not grow with the
+number of samples, and the error and fork counters.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# upper bounds of the buckets, in seconds: 50us doubling up to ~105s
+BUCKETS = [0.00005 * (2 ** i) for i in range(22)]
+
+# ovs-vsctl commands that take a table as second word
+TABLE_VERBS = ("set", "get", "add", "remove", "clear", "list", "find", "create", "destroy")
+
+# ovs-vsctl/ovs-ofctl options given with their value as the next argument
+VALUE_OPTIONS = ("-O", "--protocols", "-F", "--flow-format", "-t", "--timeout", "--db", "--format")
+
+
+class Stat(object):
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = 0
+        self.forks = 0
+
+    def observe(self, seconds):
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p):
+        if self.count == 0:
+            return 0.0
+        rank = p / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n > 0:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "forks": self.forks,
+            "mean": self.total / self.count if self.count > 0 else 0.0,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class Registry(object):
+
+    def __init__(self):
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.dumper = None
+
+    def _stat(self, key):
+        stat = self.stats.get(key)
+        if stat is None:
+            stat = self.stats.setdefault(key, Stat())
+        return stat
+
+    def observe(self, key, seconds, error=False, forks=0):
+        with self.lock:
+            stat = self._stat(key)
+            stat.observe(seconds)
+            stat.forks += forks
+            if error:
+                stat.errors += 1
+
+    @contextmanager
+    def timed(self, key, forks=0):
+        start = time.monotonic()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.observe(key, time.monotonic() - start, error, forks)
+
+    def get(self, key):
+        with self.lock:
+            stat = self.stats.get(key)
+            return None if stat is None else stat.summary()
+
+    def snapshot(self):
+        with self.lock:
+            return dict((k, s.summary()) for k, s in self.stats.items())
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+
+    def dump(self, logger):
+        for key, s in sorted(self.snapshot().items()):
+            logger.info("{}: count={} errors={} forks={} p50={:.2f}ms p99={:.2f}ms max={:.2f}ms".format(
+                key, s["count"], s["errors"], s["forks"], s["p50"] * 1000, s["p99"] * 1000, s["max"] * 1000))
+
+    def start_dump(self, interval, logger):
+        self.stop_dump()
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                self.dump(logger)
+
+        t = threading.Thread(target=run, name="metrics-dump")
+        t.daemon = True
+        t.start()
+        self.dumper = stop
+
+    def stop_dump(self):
+        if self.dumper is not None:
+            self.dumper.set()
+            self.dumper = None
+
+
+def command_verb(cmd):
+    """
+    Key of an ovs-vsctl/ovs-ofctl command line: the verbs of its commands,
+    with the table for database commands, joined by "+".
+    """
+    prefix = "ofctl " if cmd[0].endswith("ovs-ofctl") else ""
+    verbs = []
+    expect = True
+    i = 1
+    while i < len(cmd):
+        arg = cmd[i]
+        if arg == "--":
+            expect = True
+        elif arg in VALUE_OPTIONS:
+            i += 1
+        elif expect and not arg.startswith("-"):
+            verb = arg
+            if arg in TABLE_VERBS and i + 1 < len(cmd):
+                verb = "{} {}".format(arg, cmd[i + 1])
+            if len(verbs) == 0 or verbs[-1] != verb:
+                verbs.append(verb)
+            expect = False
+        i += 1
+    return prefix + "+".join(verbs)
+
+
+def transact_verb(ops):
+    verbs = []
+    for op in ops:
+        if op["op"] == "wait":
+            continue
+        verb = "{} {}".format(op["op"], op["table"])
+        if verb not in verbs:
+            verbs.append(verb)
+    return "transact " + "+".join(verbs)
+
+
+REGISTRY = Registry()
+
+
+def timed(key, forks=0):
+    return REGISTRY.timed(key, forks)
+
+
+def snapshot():
+    return REGISTRY.snapshot()
+
+
+def get(key):
+    return REGISTRY.get(key)
+
+
+def reset():
+    REGISTRY.reset()
+
+
+def start_dump(interval, logger):
+    REGISTRY.start_dump(interval, logger)
+
+
+def stop_dump():
+    REGISTRY.stop_dump()
@@ -0,0 +1,132 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+"""
+In-memory model of the terminal device.
+
+The records have __slots__ and no instance dict, and their name fields are
+interned because the same port and transceiver names are repeated across
+channels, components and OVS commands. Records are not changed in place,
+replace() returns a copy, so holders such as the cache can still see the
+previous values of a record they are re-indexing.
+"""
+
+import sys
+
+from sdnm_cassini.utils import convert_freq_vlan
+
+
+def intern_name(name):
+    if name is None:
+        return None
+    return sys.intern(name)
+
+
+class Record(object):
+    __slots__ = ()
+    NAMES = ()
+
+    def __init__(self, *args, **kwargs):
+        if len(args) > len(self.__slots__):
+            raise TypeError("{} takes at most {} values".format(type(self).__name__, len(self.__slots__)))
+        values = dict(zip(self.__slots__, args))
+        for field, value in kwargs.items():
+            if field not in self.__slots__ or field in values:
+                raise TypeError("{} got an unexpected value for {}".format(type(self).__name__, field))
+            values[field] = value
+        for field in self.__slots__:
+            value = values.get(field)
+            if field in self.NAMES:
+                value = intern_name(value)
+            setattr(self, field, value)
+
+    def _values(self):
+        return dict((f, getattr(self, f)) for f in self.__slots__)
+
+    def replace(self, **kwargs):
+        values = self._values()
+        values.update(kwargs)
+        return type(self)(**values)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self._values() == other._values()
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__,
+                               ", ".join("{}={!r}".format(f, getattr(self, f)) for f in self.__slots__))
+
+
+class Assignment(Record):
+    __slots__ = ("index", "assignment_type", "logical_channel", "allocation")
+    NAMES = ("assignment_type",)
+
+
+class LogicalChannel(Record):
+    """
+    Terminal-device channel, the assignment fields are read and replaced
+    through the channel as well.
+    """
+    __slots__ = ("index", "description", "transceiver", "assignment")
+    NAMES = ("description", "transceiver")
+    ASSIGNMENT = ("assignment_type", "logical_channel", "allocation")
+
+    @property
+    def assignment_type(self):
+        return None if self.assignment is None else self.assignment.assignment_type
+
+    @property
+    def logical_channel(self):
+        return None if self.assignment is None else self.assignment.logical_channel
+
+    @property
+    def allocation(self):
+        return None if self.assignment is None else self.assignment.allocation
+
+    def replace(self, **kwargs):
+        changes = {}
+        for field in self.ASSIGNMENT:
+            if field in kwargs:
+                changes[field] = kwargs.pop(field)
+        if len(changes) > 0:
+            assignment = self.assignment
+            if assignment is None:
+                assignment = Assignment(self.index)
+            kwargs["assignment"] = assignment.replace(**changes)
+        return Record.replace(self, **kwargs)
+
+
+class OpticalChannel(Record):
+    __slots__ = ("frequency",)
+
+    @property
+    def vlan(self):
+        if self.frequency is None:
+            return None
+        return convert_freq_vlan(self.frequency)
+
+
+class Component(Record):
+    __slots__ = ("name", "type", "optical_channel")
+    NAMES = ("name", "type")
+
+    @property
+    def frequency(self):
+        return None if self.optical_channel is None else self.optical_channel.frequency
@@ -0,0 +1,156 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+"""
+OpenFlow dataplane mode.
+
+Every channel port is patched to a port of its own on the cross-connect bridge
+(XC_BRIDGE), whose OpenFlow port number is the channel index. The client to
+line cross-connects and the frequency to VLAN push/pop are flows on that bridge
+and are installed with "ovs-ofctl --bundle", so a whole channel plan is applied
+atomically by one call.
+"""
+
+import os
+import tempfile
+import threading
+
+from sdnm_cassini import ovsctl
+
+OFCTL_CMD = ovsctl.OFCTL_CMD
+XC_BRIDGE = os.environ.get("CASSINI_XC_BRIDGE", "cassini-xc")
+COOKIE = "0xca55"
+PRIORITY = 100
+
+
+def xc_port(port):
+    return "xc-{}".format(port)
+
+
+def _ofctl_cmd(cmd):
+    cmd = [OFCTL_CMD, "-O", "OpenFlow14", "--bundle"] + cmd
+    return ovsctl._run_command(cmd)
+
+
+def bundle(br, command, flows):
+    with tempfile.NamedTemporaryFile(mode="w", suffix=".flows", delete=False) as f:
+        f.write("\n".join(flows) + "\n")
+        name = f.name
+    try:
+        return _ofctl_cmd([command, br, name])
+    finally:
+        os.unlink(name)
+
+
+class FlowPlan(object):
+    """
+    Channel plan of the cross-connect bridge: which client is connected to which
+    line port and the VLAN of every line port. commit() sends only the flows of
+    the cross-connects changed since the last call, apply() replaces the whole
+    flow table.
+    """
+
+    def __init__(self, bridge=XC_BRIDGE):
+        self.bridge = bridge
+        self.ofport = {}
+        self.clients = {}
+        self.lines = {}
+        self.vlans = {}
+        self.installed = {}
+        self.dirty = set()
+        self.lock = threading.Lock()
+
+    def add_port(self, port, num):
+        with self.lock:
+            self.ofport[port] = int(num)
+
+    def set_vlan(self, line, vlan):
+        with self.lock:
+            if vlan is not None and "{}".format(vlan) == "0":
+                vlan = None
+            self.vlans[line] = vlan
+            client = self.lines.get(line)
+            if client is not None:
+                self.dirty.add(client)
+
+    def connect(self, client, line):
+        with self.lock:
+            self._disconnect(client)
+            self._disconnect(self.lines.get(line))
+            self.clients[client] = line
+            self.lines[line] = client
+            self.dirty.add(client)
+
+    def disconnect(self, client):
+        with self.lock:
+            self._disconnect(client)
+
+    def _disconnect(self, client):
+        line = self.clients.pop(client, None)
+        if line is not None:
+            self.lines.pop(line, None)
+            self.dirty.add(client)
+
+    def _flows(self, client):
+        line = self.clients.get(client)
+        if line is None:
+            return []
+        vlan = self.vlans.get(line)
+        c = self.ofport[client]
+        l = self.ofport[line]
+        if vlan is None:
+            return []
+        return [
+            "cookie={},priority={},in_port={},actions=push_vlan:0x8100,mod_vlan_vid:{},output:{}".format(
+                COOKIE, PRIORITY, c, vlan, l),
+            "cookie={},priority={},in_port={},dl_vlan={},actions=pop_vlan,output:{}".format(
+                COOKIE, PRIORITY, l, vlan, c),
+        ]
+
+    def _delete(self, flow):
+        match = [f for f in flow.split(",actions=")[0].split(",") if not f.startswith("cookie=")]
+        return "delete_strict " + ",".join(match)
+
+    def commit(self):
+        with self.lock:
+            lines = []
+            installed = {}
+            for client in sorted(self.dirty):
+                old = self.installed.get(client, [])
+                new = self._flows(client)
+                if old == new:
+                    continue
+                lines += [self._delete(f) for f in old]
+                lines += ["add " + f for f in new]
+                installed[client] = new
+            ret = None
+            if len(lines) > 0:
+                ret = bundle(self.bridge, "add-flows", lines)
+            self.installed.update(installed)
+            self.dirty = set()
+            return ret
+
+    def apply(self):
+        with self.lock:
+            installed = {}
+            flows = []
+            for client in sorted(self.clients):
+                installed[client] = self._flows(client)
+                flows += installed[client]
+            ret = bundle(self.bridge, "replace-flows", flows)
+            self.installed = installed
+            self.dirty = set()
+            return ret
@@ -14,18 +14,23 @@
 #  limitations under the License.                                              +
 # ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
+import json
 import subprocess
+import sys
+
+from sdnm_cassini import metrics
+from sdnm_cassini.trunks import TrunkIndex
 
 VSCTL_CMD = "/usr/bin/ovs-vsctl"
 OFCTL_CMD = "/usr/bin/ovs-ofctl"
 
 
 def _run_command(cmd):
-    ret = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    if ret.returncode > 0:
-        raise RuntimeError(ret.stderr.decode("utf-8"))
-    else:
-        return ret.stdout.decode("utf-8")
+    with metrics.timed(metrics.command_verb(cmd), forks=1):
+        ret = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if ret.returncode > 0:
+            raise RuntimeError(ret.stderr.decode("utf-8"))
+    return ret.stdout.decode("utf-8")
 
 
 def _vsctl_cmd(cmd):
@@ -35,49 +40,120 @@ def _vsctl_cmd(cmd):
         return ret
 
 
+class Transaction(object):
+    """
+    Collects ovs-vsctl commands and commits them with a single
+    "ovs-vsctl -- cmd1 -- cmd2 ..." invocation, which ovsdb applies atomically.
+    """
+
+    def __init__(self):
+        self.cmds = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.cmds = []
+        return False
+
+    def _add(self, cmd):
+        self.cmds.append(cmd)
+        return self
+
+    def add_bridge(self, name):
+        return self._add(["add-br", name])
+
+    def del_bridge(self, name):
+        return self._add(["del-br", name])
+
+    def set_fail_mode(self, name, mode):
+        return self._add(["set-fail-mode", name, mode])
+
+    def add_port(self, name, port):
+        return self._add(["add-port", name, port])
+
+    def del_port(self, name, port):
+        return self._add(["del-port", name, port])
+
+    def set_port_num(self, port, num):
+        return self._add(["set", "interface", port, "ofport_request={}".format(num)])
+
+    def set_type_port(self, port, type):
+        return self._add(["set", "interface", port, "type={}".format(type)])
+
+    def set_peer_port(self, port, peer):
+        return self._add(["set", "interface", port, "options:peer={}".format(peer)])
+
+    def set_vlan_port(self, port, freq):
+        return self._add(["set", "port", port, "vlan_mode=dot1q-tunnel", "tag={}".format(freq)])
+
+    def rem_vlan_port(self, port, freq):
+        return self._add(["remove", "port", port, "tag", "{}".format(freq)])
+
+    def add_trunk_tag(self, trunk, tag):
+        return self._add(["add", "port", "{}".format(trunk), "trunks", "{}".format(tag)])
+
+    def rem_trunk_tag(self, trunk, tag):
+        return self._add(["remove", "port", "{}".format(trunk), "trunks", "{}".format(tag)])
+
+    def clear_vlan_port(self, port):
+        return self._add(["clear", "port", port, "tag"])
+
+    def set_trunk_port(self, trunk, tags):
+        return self._add(["set", "port", "{}".format(trunk), "trunks={}".format(",".join(tags))])
+
+    def add_port_patch(self, name, port, num_port, peer=None):
+        self.add_port(name, port)
+        return self._add(["set", "interface", port, "type=patch", "options:peer={}".format(peer),
+                          "ofport_request={}".format(num_port)])
+
+    def commit(self):
+        if len(self.cmds) == 0:
+            return None
+        cmd = []
+        for c in self.cmds:
+            cmd += ["--"] + c
+        self.cmds = []
+        return _vsctl_cmd(cmd)
+
+
 def add_bridge(name):
-    cmd = ["add-br", name]
-    return _vsctl_cmd(cmd)
+    return Transaction().add_bridge(name).commit()
 
 
 def del_bridge(name):
-    cmd = ["del-br", name]
-    return _vsctl_cmd(cmd)
+    return Transaction().del_bridge(name).commit()
 
 
 def add_port(name, port):
-    cmd = ["add-port", name, port]
-    return _vsctl_cmd(cmd)
+    return Transaction().add_port(name, port).commit()
 
 
 def del_port(name, port):
-    cmd = ["del-port", name, port]
-    return _vsctl_cmd(cmd)
+    return Transaction().del_port(name, port).commit()
 
 
 def set_port_num(port, num):
-    cmd = ["set", "interface", port, "ofport_request={}".format(num)]
-    return _vsctl_cmd(cmd)
+    return Transaction().set_port_num(port, num).commit()
 
 
 def set_type_port(port, type):
-    cmd = ["set", "interface", port, "type={}".format(type)]
-    return _vsctl_cmd(cmd)
+    return Transaction().set_type_port(port, type).commit()
 
 
 def set_peer_port(port, peer):
-    cmd = ["set", "interface", port, "options:peer={}".format(peer)]
-    return _vsctl_cmd(cmd)
+    return Transaction().set_peer_port(port, peer).commit()
 
 
 def set_vlan_port(port, freq):
-    cmd = ["set", "port", port, "vlan_mode=dot1q-tunnel", "tag={}".format(freq)]
-    return _vsctl_cmd(cmd)
+    return Transaction().set_vlan_port(port, freq).commit()
 
 
 def rem_vlan_port(port, freq):
-    cmd = ["remove", "port", port, "tag", "{}".format(freq)]
-    return _vsctl_cmd(cmd)
+    return Transaction().rem_vlan_port(port, freq).commit()
 
 
 def get_ports(br):
@@ -100,48 +176,73 @@ def get_tag_port(port):
     return _vsctl_cmd(cmd)
 
 
-def get_trunk_ports(br):
-    ports = get_ports(br)
-    for i in ports:
-        if is_trunk(i):
-            return i
-    raise RuntimeWarning("there are not trunk ports")
+def _trunks_of(out):
+    ret = out.strip().strip("[]")
+    return [int(t) for t in ret.split(",") if len(t.strip()) > 0]
+
 
+def get_trunks_port(port):
+    cmd = ["get", "port", port, "trunks"]
+    return _trunks_of(_vsctl_cmd(cmd))
 
-def get_tags_br(br):
-    ports = get_ports(br)
-    tags = []
-    for port in ports:
-        if not is_trunk(port):
-            tag = get_tag_port(port)
-            tags.append(tag.replace("\n", ""))
 
-    if len(tags) == 0:
-        raise RuntimeWarning("there are is not tagged ports")
-    return tags
+def clear_vlan_port(port):
+    return Transaction().clear_vlan_port(port).commit()
 
 
 def set_trunk_port(trunk, tags):
-    cmd = ["set", "port", "{}".format(trunk), "trunks={}".format(",".join(tags))]
-    _vsctl_cmd(cmd)
+    Transaction().set_trunk_port(trunk, tags).commit()
+
 
+def add_trunk_tag(trunk, tag):
+    return Transaction().add_trunk_tag(trunk, tag).commit()
 
-def update_trunk_port(br):
-    trunk = get_trunk_ports(br)
-    tags = get_tags_br(br)
-    set_trunk_port(trunk, tags)
+
+def rem_trunk_tag(trunk, tag):
+    return Transaction().rem_trunk_tag(trunk, tag).commit()
+
+
+_trunks = TrunkIndex(sys.modules[__name__])
+get_trunk_ports = _trunks.get_trunk_ports
+get_tags_br = _trunks.get_tags_br
+update_trunk_port = _trunks.update_trunk_port
+invalidate_trunks = _trunks.invalidate_trunks
 
 
 def add_port_patch(name, port, num_port, peer=None):
     try:
-        add_port(name, port)
-        set_type_port(port, "patch")
-        set_peer_port(port, peer)
-        set_port_num(port, num_port)
+        Transaction().add_port_patch(name, port, num_port, peer).commit()
     except Exception as ex:
         raise RuntimeError(ex.__str__())
 
 
+def port_to_br(port):
+    cmd = ["port-to-br", port]
+    return _vsctl_cmd(cmd).strip()
+
+
+TABLES_CMD = ["--format=json",
+              "--", "--columns=name,ports", "list", "bridge",
+              "--", "--columns=_uuid,name,tag", "list", "port",
+              "--", "--columns=_uuid,name,type,options,ofport_request", "list", "interface"]
+
+
+def _tables_of(out):
+    decoder = json.JSONDecoder()
+    tables = []
+    pos = 0
+    while len(tables) < 3:
+        while out[pos].isspace():
+            pos += 1
+        t, pos = decoder.raw_decode(out, pos)
+        tables.append([dict(zip(t["headings"], row)) for row in t["data"]])
+    return {"Bridge": tables[0], "Port": tables[1], "Interface": tables[2]}
+
+
+def get_tables():
+    return _tables_of(_vsctl_cmd(TABLES_CMD))
+
+
 def list_bridges():
     cmd = ["list-br"]
     v = _vsctl_cmd(cmd)
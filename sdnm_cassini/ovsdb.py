@@ -0,0 +1,592 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+"""
+OVSDB JSON-RPC (RFC 7047) backend with the same surface as ovsctl.
+
+A single connection to the ovsdb-server unix socket is kept open and every
+operation is sent as a "transact" request, so no ovs-vsctl process is forked.
+"""
+
+import codecs
+import json
+import os
+import socket
+import sys
+import threading
+
+from sdnm_cassini import metrics
+from sdnm_cassini.trunks import TrunkIndex
+
+DB_SOCK = os.environ.get("OVSDB_SOCK", "/var/run/openvswitch/db.sock")
+DB_NAME = "Open_vSwitch"
+
+
+class OvsdbClient(object):
+
+    def __init__(self, path=DB_SOCK, database=DB_NAME):
+        self.path = path
+        self.database = database
+        self.sock = None
+        self.reader = None
+        self.decoder = json.JSONDecoder()
+        self.next_id = 0
+        self.pending = {}
+        self.monitors = {}
+        self.subscriptions = {}
+        self.lock = threading.Lock()
+
+    def connect(self):
+        with self.lock:
+            if self.sock is not None:
+                return self
+            s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                s.connect(self.path)
+            except OSError as ex:
+                s.close()
+                raise RuntimeError("cannot connect to ovsdb {}: {}".format(self.path, ex))
+            self.sock = s
+            self.reader = threading.Thread(target=self._read_loop, args=(s,), name="ovsdb-reader")
+            self.reader.daemon = True
+            self.reader.start()
+            subscriptions = list(self.subscriptions.values())
+
+        # monitors do not survive the connection, register them again
+        for monitor_id, requests, handler, on_reply in subscriptions:
+            self._subscribe(monitor_id, requests, handler, on_reply)
+        return self
+
+    def close(self):
+        with self.lock:
+            sock = self.sock
+            self.sock = None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+    def _send(self, msg):
+        self.sock.sendall(json.dumps(msg).encode("utf-8"))
+
+    def _read_loop(self, sock):
+        utf8 = codecs.getincrementaldecoder("utf-8")()
+        buf = ""
+        try:
+            while True:
+                data = sock.recv(65536)
+                if len(data) == 0:
+                    break
+                buf += utf8.decode(data)
+                while True:
+                    buf = buf.lstrip()
+                    if len(buf) == 0:
+                        break
+                    try:
+                        msg, end = self.decoder.raw_decode(buf)
+                    except ValueError:
+                        break
+                    buf = buf[end:]
+                    self._dispatch(msg)
+        except OSError:
+            pass
+        finally:
+            with self.lock:
+                if self.sock is sock:
+                    self.sock = None
+                pending = self.pending
+                self.pending = {}
+                self.monitors = {}
+            for slot in pending.values():
+                slot[1] = {"error": "ovsdb connection closed"}
+                slot[0].set()
+
+    def _dispatch(self, msg):
+        method = msg.get("method")
+        if method == "echo":
+            with self.lock:
+                self._send({"result": msg["params"], "error": None, "id": msg["id"]})
+        elif method == "update":
+            handler = self.monitors.get(json.dumps(msg["params"][0]))
+            if handler is not None:
+                handler(msg["params"][1])
+        elif msg.get("id") in self.pending:
+            with self.lock:
+                slot = self.pending.pop(msg["id"])
+            if slot[2] is not None and msg.get("error") is None:
+                slot[2](msg["result"])
+            slot[1] = msg
+            slot[0].set()
+
+    def request(self, method, params, on_reply=None):
+        self.connect()
+        slot = [threading.Event(), None, on_reply]
+        with self.lock:
+            self.next_id += 1
+            rid = self.next_id
+            self.pending[rid] = slot
+            try:
+                self._send({"method": method, "params": params, "id": rid})
+            except (OSError, AttributeError) as ex:
+                self.pending.pop(rid, None)
+                raise RuntimeError("ovsdb request {} failed: {}".format(method, ex))
+        slot[0].wait()
+
+        msg = slot[1]
+        if msg.get("error") is not None:
+            raise RuntimeError("ovsdb {} error: {}".format(method, msg["error"]))
+        return msg["result"]
+
+    def transact(self, ops):
+        with metrics.timed(metrics.transact_verb(ops)):
+            result = self.request("transact", [self.database] + ops)
+            for i, r in enumerate(result):
+                if r is None or "error" not in r:
+                    continue
+                if i < len(ops) and ops[i]["op"] == "wait":
+                    raise RuntimeError("no row \"{}\" in table {}".format(ops[i]["where"][0][2], ops[i]["table"]))
+                raise RuntimeError("{}: {}".format(r["error"], r.get("details", "")))
+        return result
+
+    def _subscribe(self, monitor_id, requests, handler, on_reply):
+        # the initial contents and every later "update" notification are handled
+        # by the reader thread, so they are always applied in order
+        self.monitors[json.dumps(monitor_id)] = handler
+        return self.request("monitor", [self.database, monitor_id, requests], on_reply=on_reply or handler)
+
+    def monitor(self, monitor_id, requests, handler, on_reply=None):
+        self.connect()
+        self.subscriptions[json.dumps(monitor_id)] = (monitor_id, requests, handler, on_reply)
+        return self._subscribe(monitor_id, requests, handler, on_reply)
+
+
+class Replica(object):
+    """
+    In-memory copy of the Bridge, Port and Interface tables kept current by an
+    OVSDB monitor, so the read helpers never leave the process.
+    """
+    TABLES = {
+        "Bridge": ["name", "ports"],
+        "Port": ["name", "interfaces", "tag", "trunks", "vlan_mode"],
+        "Interface": ["name", "type", "options", "ofport_request"],
+    }
+
+    def __init__(self, client):
+        self.client = client
+        self.rows = {}
+        self.names = {}
+        for t in self.TABLES:
+            self.rows[t] = {}
+            self.names[t] = {}
+        self.lock = threading.Lock()
+
+    def start(self):
+        requests = {}
+        for t, columns in self.TABLES.items():
+            requests[t] = {"columns": columns}
+        self.client.monitor("replica", requests, self.update, on_reply=self.load)
+        return self
+
+    def load(self, updates):
+        with self.lock:
+            for t in self.TABLES:
+                self.rows[t] = {}
+                self.names[t] = {}
+        self.update(updates)
+
+    def update(self, updates):
+        with self.lock:
+            for table, rows in updates.items():
+                for uuid, change in rows.items():
+                    old = self.rows[table].pop(uuid, None)
+                    if old is not None and self.names[table].get(old["name"]) == uuid:
+                        del self.names[table][old["name"]]
+                    new = change.get("new")
+                    if new is not None:
+                        self.rows[table][uuid] = new
+                        self.names[table][new["name"]] = uuid
+
+    def uuid(self, table, name):
+        with self.lock:
+            uuid = self.names[table].get(name)
+        if uuid is None:
+            raise RuntimeError("no row \"{}\" in table {}".format(name, table))
+        return uuid
+
+    def row(self, table, name):
+        with self.lock:
+            uuid = self.names[table].get(name)
+            if uuid is None:
+                raise RuntimeError("no row \"{}\" in table {}".format(name, table))
+            return self.rows[table][uuid]
+
+    def bridges(self):
+        with self.lock:
+            return sorted(self.names["Bridge"])
+
+    def ports(self, br):
+        bridge = self.row("Bridge", br)
+        with self.lock:
+            names = [self.rows["Port"][u]["name"] for u in _uuids(bridge["ports"]) if u in self.rows["Port"]]
+        return sorted(n for n in names if n != br)
+
+    def tables(self):
+        with self.lock:
+            ret = {}
+            for t, rows in self.rows.items():
+                ret[t] = []
+                for uuid, row in rows.items():
+                    r = dict(row)
+                    r["_uuid"] = ["uuid", uuid]
+                    ret[t].append(r)
+            return ret
+
+    def port_to_br(self, port):
+        uuid = self.uuid("Port", port)
+        with self.lock:
+            for br in self.rows["Bridge"].values():
+                if uuid in _uuids(br["ports"]):
+                    return br["name"]
+        raise RuntimeError("no port named {}".format(port))
+
+
+_client = None
+_replica = None
+
+
+def connect(path=DB_SOCK, monitor=True):
+    global _client, _replica
+    if _client is not None:
+        _client.close()
+    _client = OvsdbClient(path)
+    _replica = None
+    _trunks.invalidate()
+    if monitor:
+        _replica = Replica(_client).start()
+    return _client
+
+
+def _transact(ops):
+    if _client is None:
+        connect()
+    return _client.transact(ops)
+
+
+def _name(name):
+    return [["name", "==", name]]
+
+
+def _exists(table, name):
+    return {"op": "wait", "table": table, "where": _name(name), "columns": ["name"],
+            "until": "!=", "rows": [], "timeout": 0}
+
+
+def _set(value):
+    if isinstance(value, list) and value[0] == "set":
+        return value[1]
+    return [value]
+
+
+def _uuids(value):
+    if value[0] == "uuid":
+        return [value[1]]
+    return [u[1] for u in value[1]]
+
+
+def _live_replica():
+    """
+    The replica, None without one. Its monitor stops with the connection, so
+    after a disconnect the client connects again, which loads the tables anew,
+    before the replica is read; reads fail when ovsdb cannot be reached.
+    """
+    if _replica is not None and _client.sock is None:
+        _client.connect()
+    return _replica
+
+
+def _select(table, name, columns):
+    if columns == ["_uuid"] and _live_replica() is not None:
+        return {"_uuid": ["uuid", _replica.uuid(table, name)]}
+    ops = [{"op": "select", "table": table, "where": _name(name), "columns": columns}]
+    rows = _transact(ops)[0]["rows"]
+    if len(rows) == 0:
+        raise RuntimeError("no row \"{}\" in table {}".format(name, table))
+    return rows[0]
+
+
+class Transaction(object):
+    """
+    Collects ovsctl-style operations and commits them as one OVSDB transaction.
+    """
+
+    def __init__(self):
+        self.ops = []
+        self.rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.ops = []
+        return False
+
+    def _row_name(self):
+        self.rows += 1
+        return "row{}".format(self.rows)
+
+    def _insert_port(self, port, iface):
+        iface["name"] = port
+        i = self._row_name()
+        p = self._row_name()
+        self.ops.append({"op": "insert", "table": "Interface", "row": iface, "uuid-name": i})
+        self.ops.append({"op": "insert", "table": "Port", "uuid-name": p,
+                         "row": {"name": port, "interfaces": ["named-uuid", i]}})
+        return p
+
+    def _update(self, table, name, row):
+        self.ops.append(_exists(table, name))
+        self.ops.append({"op": "update", "table": table, "where": _name(name), "row": row})
+        return self
+
+    def _mutate(self, table, name, mutations):
+        self.ops.append(_exists(table, name))
+        self.ops.append({"op": "mutate", "table": table, "where": _name(name), "mutations": mutations})
+        return self
+
+    def add_bridge(self, name):
+        p = self._insert_port(name, {"type": "internal"})
+        b = self._row_name()
+        self.ops.append({"op": "insert", "table": "Bridge", "uuid-name": b,
+                         "row": {"name": name, "ports": ["named-uuid", p]}})
+        self.ops.append({"op": "mutate", "table": "Open_vSwitch", "where": [],
+                         "mutations": [["bridges", "insert", ["named-uuid", b]]]})
+        return self
+
+    def del_bridge(self, name):
+        uuid = _select("Bridge", name, ["_uuid"])["_uuid"]
+        self.ops.append({"op": "mutate", "table": "Open_vSwitch", "where": [],
+                         "mutations": [["bridges", "delete", uuid]]})
+        return self
+
+    def set_fail_mode(self, name, mode):
+        return self._update("Bridge", name, {"fail_mode": mode})
+
+    def add_port(self, name, port):
+        self.ops.append(_exists("Bridge", name))
+        p = self._insert_port(port, {})
+        self.ops.append({"op": "mutate", "table": "Bridge", "where": _name(name),
+                         "mutations": [["ports", "insert", ["named-uuid", p]]]})
+        return self
+
+    def del_port(self, name, port):
+        uuid = _select("Port", port, ["_uuid"])["_uuid"]
+        return self._mutate("Bridge", name, [["ports", "delete", uuid]])
+
+    def set_port_num(self, port, num):
+        return self._update("Interface", port, {"ofport_request": int(num)})
+
+    def set_type_port(self, port, type):
+        return self._update("Interface", port, {"type": type})
+
+    def set_peer_port(self, port, peer):
+        return self._mutate("Interface", port, [["options", "delete", ["set", ["peer"]]],
+                                                ["options", "insert", ["map", [["peer", peer]]]]])
+
+    def set_vlan_port(self, port, freq):
+        return self._update("Port", port, {"vlan_mode": "dot1q-tunnel", "tag": int(freq)})
+
+    def rem_vlan_port(self, port, freq):
+        return self._mutate("Port", port, [["tag", "delete", int(freq)]])
+
+    def add_trunk_tag(self, trunk, tag):
+        return self._mutate("Port", trunk, [["trunks", "insert", int(tag)]])
+
+    def rem_trunk_tag(self, trunk, tag):
+        return self._mutate("Port", trunk, [["trunks", "delete", int(tag)]])
+
+    def clear_vlan_port(self, port):
+        return self._update("Port", port, {"tag": ["set", []]})
+
+    def set_trunk_port(self, trunk, tags):
+        trunks = [int(t) for t in tags if t != "[]"]
+        return self._update("Port", trunk, {"trunks": ["set", trunks]})
+
+    def add_port_patch(self, name, port, num_port, peer=None):
+        iface = {"type": "patch", "ofport_request": int(num_port)}
+        if peer is not None:
+            iface["options"] = ["map", [["peer", peer]]]
+        self.ops.append(_exists("Bridge", name))
+        p = self._insert_port(port, iface)
+        self.ops.append({"op": "mutate", "table": "Bridge", "where": _name(name),
+                         "mutations": [["ports", "insert", ["named-uuid", p]]]})
+        return self
+
+    def commit(self):
+        if len(self.ops) == 0:
+            return None
+        ops = self.ops
+        self.ops = []
+        self.rows = 0
+        return _transact(ops)
+
+
+def add_bridge(name):
+    return Transaction().add_bridge(name).commit()
+
+
+def del_bridge(name):
+    return Transaction().del_bridge(name).commit()
+
+
+def add_port(name, port):
+    return Transaction().add_port(name, port).commit()
+
+
+def del_port(name, port):
+    return Transaction().del_port(name, port).commit()
+
+
+def set_port_num(port, num):
+    return Transaction().set_port_num(port, num).commit()
+
+
+def set_type_port(port, type):
+    return Transaction().set_type_port(port, type).commit()
+
+
+def set_peer_port(port, peer):
+    return Transaction().set_peer_port(port, peer).commit()
+
+
+def set_vlan_port(port, freq):
+    return Transaction().set_vlan_port(port, freq).commit()
+
+
+def rem_vlan_port(port, freq):
+    return Transaction().rem_vlan_port(port, freq).commit()
+
+
+def get_ports(br):
+    if _live_replica() is not None:
+        return _replica.ports(br)
+    ops = [{"op": "select", "table": "Bridge", "where": _name(br), "columns": ["ports"]},
+           {"op": "select", "table": "Port", "where": [], "columns": ["_uuid", "name"]}]
+    res = _transact(ops)
+    if len(res[0]["rows"]) == 0:
+        raise RuntimeError("no bridge named {}".format(br))
+    uuids = set(_uuids(res[0]["rows"][0]["ports"]))
+    names = [r["name"] for r in res[1]["rows"] if r["_uuid"][1] in uuids]
+    # list-ports does not report the bridge local port
+    return sorted(n for n in names if n != br)
+
+
+def _port_row(port, columns):
+    if _live_replica() is not None:
+        return _replica.row("Port", port)
+    return _select("Port", port, columns)
+
+
+def is_trunk(port):
+    row = _port_row(port, ["trunks"])
+    if len(_set(row["trunks"])) == 0:
+        return False
+    return True
+
+
+def get_tag_port(port):
+    tag = _set(_port_row(port, ["tag"])["tag"])
+    if len(tag) == 0:
+        return "[]"
+    return "{}".format(tag[0])
+
+
+def get_trunks_port(port):
+    return [int(t) for t in _set(_port_row(port, ["trunks"])["trunks"])]
+
+
+def clear_vlan_port(port):
+    return Transaction().clear_vlan_port(port).commit()
+
+
+def set_trunk_port(trunk, tags):
+    return Transaction().set_trunk_port(trunk, tags).commit()
+
+
+def add_trunk_tag(trunk, tag):
+    return Transaction().add_trunk_tag(trunk, tag).commit()
+
+
+def rem_trunk_tag(trunk, tag):
+    return Transaction().rem_trunk_tag(trunk, tag).commit()
+
+
+_trunks = TrunkIndex(sys.modules[__name__])
+get_trunk_ports = _trunks.get_trunk_ports
+get_tags_br = _trunks.get_tags_br
+update_trunk_port = _trunks.update_trunk_port
+invalidate_trunks = _trunks.invalidate_trunks
+
+
+def add_port_patch(name, port, num_port, peer=None):
+    try:
+        return Transaction().add_port_patch(name, port, num_port, peer).commit()
+    except Exception as ex:
+        raise RuntimeError(ex.__str__())
+
+
+def port_to_br(port):
+    if _live_replica() is not None:
+        return _replica.port_to_br(port)
+    uuid = _select("Port", port, ["_uuid"])["_uuid"]
+    ops = [{"op": "select", "table": "Bridge", "where": [["ports", "includes", uuid]], "columns": ["name"]}]
+    rows = _transact(ops)[0]["rows"]
+    if len(rows) == 0:
+        raise RuntimeError("no port named {}".format(port))
+    return rows[0]["name"]
+
+
+def get_tables():
+    if _live_replica() is not None:
+        return _replica.tables()
+    columns = {"Bridge": ["name", "ports"], "Port": ["_uuid", "name", "tag"],
+               "Interface": ["_uuid", "name", "type", "options", "ofport_request"]}
+    ops = [{"op": "select", "table": t, "where": [], "columns": c} for t, c in columns.items()]
+    res = _transact(ops)
+    ret = {}
+    for t, r in zip(columns, res):
+        ret[t] = r["rows"]
+    return ret
+
+
+def list_bridges():
+    if _live_replica() is not None:
+        return _replica.bridges()
+    ops = [{"op": "select", "table": "Bridge", "where": [], "columns": ["name"]}]
+    rows = _transact(ops)[0]["rows"]
+    return sorted(r["name"] for r in rows)
+
+
+def exist_bridge(name):
+    brs = list_bridges()
+    if name in brs:
+        return True
+    else:
+        return False
@@ -14,47 +14,83 @@
 #  limitations under the License.                                              +
 # ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
-from sdnm_cassini.utils import make_query, convert_freq_vlan
+from sdnm_cassini import accessors
+from sdnm_cassini.model import Component, OpticalChannel
+from sdnm_cassini.utils import convert_freq_vlan, iter_query
+from sdnm_cassini.xpath import parse_xpath
 
 MODULE = "openconfig-platform:components"
 
+COMPONENT_LIST = "/{}/component".format(MODULE)
+
+COMPONENT_KEY = "name"
+
+FREQUENCY = "openconfig-terminal-device:optical-channel/config/frequency"
+
+# frequency leaf as returned by component_leaf
+FREQUENCY_NODE = "optical-channel/config/frequency"
+
 
 def get_component_config_name(session):
     module = MODULE
     submodule = "component[node()]/config/name"
     xpath = "/{}/{}".format(module,submodule)
-    values = make_query(session, xpath, multi=True)
-    if values is None:
-        return None
-    ret = []
-    for v in values:
-        s = v.split("name = ")
-        if "/" not in s[1]:
-            ret.append(s[1])
-    return ret.copy()
+    return [v for v in iter_query(session, xpath) if "/" not in v]
 
 
 def get_component_state_type(session, name):
-    module = MODULE
-    submodule = "component[name='{}']/state/type".format(name)
-    xpath = "/{}/{}".format(module,submodule)
-    values = make_query(session, xpath)
-    if values is None:
+    value = accessors.get_component_state_type(session, name)
+    if value is None:
         return None
-    s = values[0].split("type = ")
-    t = s[1].split(":")
-    return t[1]
+    return value.split(":")[-1]
 
 
 def get_config_frequency_vlan(session, name):
-    module = MODULE
-    submodule = "component[name='{}']/openconfig-terminal-device:optical-channel/config/frequency".format(name)
-    xpath = "/{}/{}".format(module, submodule)
-    values = make_query(session, xpath)
-    s = values[0].split("frequency = ")
-    f = s[1]
+    f = accessors.get_component_optical_channel_config_frequency(session, name)
     v = None
     if f is not None:
-        v = convert_freq_vlan(f.strip())
-        return f, v
-    return f, v
\ No newline at end of file
+        v = convert_freq_vlan(f)
+    return f, v
+
+
+def component_leaf(xpath):
+    """
+    Returns (name, leaf) of a component xpath, leaf is the path below the
+    component entry without prefixes or None for the entry itself or its name
+    key.
+    """
+    path = parse_xpath(xpath)
+    if path is None or path.segments[:2] != ("components", "component") or "component" not in path.keys:
+        return None
+    if path.segments[2:] in ((), (COMPONENT_KEY,)):
+        return path.keys["component"], None
+    return path.keys["component"], "/".join(path.segments[2:])
+
+
+def get_config_frequencies(session):
+    """
+    Frequencies of every optical channel component with one query, keyed by
+    component name.
+    """
+    xpath = "{}/{}".format(accessors.COMPONENT_ANY, FREQUENCY)
+    ret = {}
+    for name, fields in accessors.read_component(session, xpath).items():
+        ret[name] = fields["optical_channel_config_frequency"]
+    return ret
+
+
+def get_components(session):
+    """
+    Component records of every component, with the optical channel of the ones
+    that have a frequency, keyed by name.
+    """
+    xpath = "{}/config/name".format(accessors.COMPONENT_ANY)
+    ret = {}
+    for name in accessors.read_component(session, xpath):
+        ret[name] = Component(name)
+    for name, freq in get_config_frequencies(session).items():
+        c = ret.get(name)
+        if c is None:
+            c = Component(name)
+        ret[c.name] = c.replace(optical_channel=OpticalChannel(freq))
+    return ret
@@ -0,0 +1,248 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+"""
+Desired-state reconciliation between sysrepo and OVS.
+
+Both sides are reduced to the same model, {bridge: {port: attributes}} where
+the attributes are type, peer, ofport and tag, and the difference is applied as
+a single transaction. Bridges that are not in the desired model are left alone,
+and so are the ports of the other bridges that are not patch ports, such as the
+trunk uplink.
+"""
+
+import sdnm_cassini.terminal_device as td
+import sdnm_cassini.platform as pl
+from sdnm_cassini import aovsctl, ofctl
+from sdnm_cassini.utils import convert_freq_vlan
+
+
+def _port(peer="none", ofport=None, tag=None):
+    return {"type": "patch", "peer": peer, "ofport": ofport, "tag": tag}
+
+
+def _set(value):
+    if isinstance(value, list) and value[0] == "set":
+        return value[1]
+    return [value]
+
+
+def _uuid(value):
+    return value[1]
+
+
+def _map(value):
+    return dict(value[1])
+
+
+def _tag(vlan):
+    if vlan is None or "{}".format(vlan) in ("0", "[]"):
+        return None
+    return int(vlan)
+
+
+def actual_state(tables):
+    """
+    Builds the model from the Bridge, Port and Interface rows returned by a
+    backend get_tables(), in OVSDB JSON notation.
+    """
+    ifaces = {}
+    for r in tables["Interface"]:
+        ofport = _set(r["ofport_request"])
+        ifaces[r["name"]] = {"type": r["type"], "peer": _map(r["options"]).get("peer"),
+                             "ofport": ofport[0] if len(ofport) > 0 else None}
+    ports = {}
+    for r in tables["Port"]:
+        tag = _set(r["tag"])
+        attrs = dict(ifaces.get(r["name"], _port(peer=None)))
+        attrs["tag"] = tag[0] if len(tag) > 0 else None
+        ports[_uuid(r["_uuid"])] = (r["name"], attrs)
+    state = {}
+    for r in tables["Bridge"]:
+        br = {}
+        for u in _set(r["ports"]):
+            name, attrs = ports.get(_uuid(u), (None, None))
+            if name is not None and name != r["name"]:
+                br[name] = attrs
+        state[r["name"]] = br
+    return state
+
+
+class Reconciler(object):
+    """
+    With a concurrency limit the difference is applied as one aovsctl
+    transaction per bridge, run at the same time, which only makes sense for
+    the vsctl backend.
+    """
+
+    def __init__(self, session, backend, flows=None, cache=None, concurrency=0):
+        self.session = session
+        self.backend = backend
+        self.flows = flows
+        self.cache = cache
+        self.concurrency = concurrency
+
+    def desired_state(self):
+        sess = self.session
+        state = {}
+        cache = self.cache
+        components = pl.get_component_config_name(sess) if cache is None else cache.get_components()
+        for name in components:
+            state[name] = {}
+        if self.flows is not None:
+            state[self.flows.bridge] = {}
+
+        channels = td.get_logical_channels(sess) if cache is None else cache.get_channels()
+        for i, ch in channels.items():
+            desc = ch.description
+            br = ch.transceiver
+            if br is None:
+                raise RuntimeError("Transceiver of channel {} not was found".format(i))
+            state.setdefault(br, {})
+            port = _port(ofport=int(i))
+            if ch.assignment_type == "OPTICAL_CHANNEL":
+                if cache is None:
+                    freq, vlan = pl.get_config_frequency_vlan(sess, desc)
+                else:
+                    freq = cache.frequency(desc)
+                    vlan = None if freq is None else convert_freq_vlan(freq)
+                if self.flows is not None:
+                    self.flows.set_vlan(desc, vlan)
+                else:
+                    port["tag"] = _tag(vlan)
+            elif ch.assignment_type != "LOGICAL_CHANNEL":
+                raise RuntimeError("Type assignment not found")
+            if self.flows is not None:
+                port["peer"] = ofctl.xc_port(desc)
+                state[self.flows.bridge][ofctl.xc_port(desc)] = _port(peer=desc, ofport=int(i))
+                self.flows.add_port(desc, i)
+            state[br][desc] = port
+
+        for i, ch in channels.items():
+            if ch.assignment_type != "LOGICAL_CHANNEL":
+                continue
+            peer_idx = ch.logical_channel
+            if peer_idx is None or peer_idx == 0 or peer_idx not in channels:
+                continue
+            desc = ch.description
+            peer = channels[peer_idx].description
+            if self.flows is not None:
+                self.flows.connect(desc, peer)
+                continue
+            for br in state.values():
+                if desc in br:
+                    br[desc]["peer"] = peer
+                if peer in br:
+                    br[peer]["peer"] = desc
+        return state
+
+    def actual_state(self):
+        return actual_state(self.backend.get_tables())
+
+    def diff(self, desired, actual):
+        """
+        Returns the minimal list of (Transaction method, args) turning actual
+        into desired.
+        """
+        ops = []
+        located = {}
+        for br, ports in actual.items():
+            for port in ports:
+                located[port] = br
+
+        for br, ports in sorted(desired.items()):
+            if br not in actual:
+                ops.append(("add_bridge", (br,)))
+                if self.flows is not None and br == self.flows.bridge:
+                    ops.append(("set_fail_mode", (br, "secure")))
+            current = actual.get(br, {})
+            for port in sorted(current):
+                # only patch ports are ours, uplinks and trunks are attached from outside
+                if port not in ports and current[port]["type"] == "patch":
+                    ops.append(("del_port", (br, port)))
+
+        for br, ports in sorted(desired.items()):
+            for port, want in sorted(ports.items()):
+                have = actual.get(br, {}).get(port)
+                if have is None and port in located and located[port] not in desired:
+                    ops.append(("del_port", (located[port], port)))
+                if have is None:
+                    ops.append(("add_port_patch", (br, port, want["ofport"], want["peer"])))
+                    if want["tag"] is not None:
+                        ops.append(("set_vlan_port", (port, want["tag"])))
+                    continue
+                if have["type"] != want["type"]:
+                    ops.append(("set_type_port", (port, want["type"])))
+                if have["peer"] != want["peer"]:
+                    ops.append(("set_peer_port", (port, want["peer"])))
+                if have["ofport"] != want["ofport"]:
+                    ops.append(("set_port_num", (port, want["ofport"])))
+                if have["tag"] != want["tag"]:
+                    if want["tag"] is None:
+                        ops.append(("clear_vlan_port", (port,)))
+                    else:
+                        ops.append(("set_vlan_port", (port, want["tag"])))
+        return ops
+
+    def apply(self, ops):
+        tx = self.backend.Transaction()
+        for method, args in ops:
+            getattr(tx, method)(*args)
+        return tx.commit()
+
+    def split(self, ops, desired):
+        """
+        Groups ops by the desired bridge of the port they write, a port moved
+        from another bridge is deleted in the group of its new bridge.
+        """
+        owner = {}
+        for br, ports in desired.items():
+            for port in ports:
+                owner[port] = br
+        groups = {}
+        for method, args in ops:
+            if method in ("add_bridge", "set_fail_mode"):
+                key = args[0]
+            elif method in ("del_port", "add_port_patch"):
+                key = owner.get(args[1], args[0])
+            else:
+                key = owner.get(args[0], args[0])
+            groups.setdefault(key, []).append((method, args))
+        return groups
+
+    def apply_concurrent(self, ops, desired):
+        txs = []
+        for group in self.split(ops, desired).values():
+            tx = aovsctl.Transaction()
+            for method, args in group:
+                getattr(tx, method)(*args)
+            txs.append(tx)
+        aovsctl.set_concurrency(self.concurrency)
+        errors = [r for r in aovsctl.run(aovsctl.gather([tx.commit() for tx in txs])) if isinstance(r, Exception)]
+        if len(errors) > 0:
+            raise RuntimeError("{} of {} bridge transactions failed: {}".format(len(errors), len(txs), errors[0]))
+
+    def reconcile(self):
+        desired = self.desired_state()
+        actual = self.actual_state()
+        ops = self.diff(desired, actual)
+        if self.concurrency > 0:
+            self.apply_concurrent(ops, desired)
+        else:
+            self.apply(ops)
+        if self.flows is not None:
+            self.flows.apply()
+        return ops
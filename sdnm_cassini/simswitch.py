@@ -0,0 +1,383 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+"""
+In-memory simulated switch implementing the ovsctl backend surface.
+
+Nothing is executed: operations are checked against the same constraints OVS
+applies (rows exist, unique names, patch peers, VLAN and OpenFlow port ranges),
+applied atomically per transaction and counted, so the dataplane logic can be
+measured without a vswitchd.
+
+Every write goes through _put/_pop, which keep an undo log of the transaction,
+so a failed transaction is rolled back without copying the tables. Values are
+replaced, never changed in place, for the log to stay valid.
+"""
+
+import threading
+from collections import Counter
+
+from sdnm_cassini.trunks import TrunkIndex
+
+IFACE_TYPES = ("", "system", "internal", "patch", "tap", "vxlan", "gre", "geneve")
+FAIL_MODES = ("standalone", "secure")
+
+_MISSING = object()
+
+
+def _vlan(tag):
+    t = int(tag)
+    if t < 0 or t > 4095:
+        raise RuntimeError("{} is outside the valid range 0 to 4095".format(t))
+    return t
+
+
+class SimTransaction(object):
+
+    def __init__(self, switch):
+        self.switch = switch
+        self.ops = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.ops = []
+        return False
+
+    def _add(self, op, *args):
+        self.ops.append((op, args))
+        return self
+
+    def add_bridge(self, name):
+        return self._add("add_bridge", name)
+
+    def del_bridge(self, name):
+        return self._add("del_bridge", name)
+
+    def set_fail_mode(self, name, mode):
+        return self._add("set_fail_mode", name, mode)
+
+    def add_port(self, name, port):
+        return self._add("add_port", name, port)
+
+    def del_port(self, name, port):
+        return self._add("del_port", name, port)
+
+    def set_port_num(self, port, num):
+        return self._add("set_port_num", port, num)
+
+    def set_type_port(self, port, type):
+        return self._add("set_type_port", port, type)
+
+    def set_peer_port(self, port, peer):
+        return self._add("set_peer_port", port, peer)
+
+    def set_vlan_port(self, port, freq):
+        return self._add("set_vlan_port", port, freq)
+
+    def rem_vlan_port(self, port, freq):
+        return self._add("rem_vlan_port", port, freq)
+
+    def clear_vlan_port(self, port):
+        return self._add("clear_vlan_port", port)
+
+    def set_trunk_port(self, trunk, tags):
+        return self._add("set_trunk_port", trunk, tags)
+
+    def add_trunk_tag(self, trunk, tag):
+        return self._add("add_trunk_tag", trunk, tag)
+
+    def rem_trunk_tag(self, trunk, tag):
+        return self._add("rem_trunk_tag", trunk, tag)
+
+    def add_port_patch(self, name, port, num_port, peer=None):
+        return self._add("add_port_patch", name, port, num_port, peer)
+
+    def commit(self):
+        if len(self.ops) == 0:
+            return None
+        ops = self.ops
+        self.ops = []
+        return self.switch.execute(ops)
+
+
+class SimulatedSwitch(object):
+
+    def __init__(self):
+        self.bridges = {}
+        self.ports = {}
+        self.ifaces = {}
+        self.lock = threading.RLock()
+        self.undo = None
+        self.record = True
+        self.reset_stats()
+        self._trunks = TrunkIndex(self)
+
+    def reset_stats(self):
+        self.commits = 0
+        self.errors = 0
+        self.operations = Counter()
+        self.reads = Counter()
+        self.log = []
+
+    def stats(self):
+        return {"commits": self.commits, "errors": self.errors,
+                "operations": dict(self.operations), "reads": dict(self.reads)}
+
+    def Transaction(self):
+        return SimTransaction(self)
+
+    def execute(self, ops):
+        with self.lock:
+            self.undo = []
+            try:
+                for op, args in ops:
+                    getattr(self, "_" + op)(*args)
+            except Exception as ex:
+                for row, key, value in reversed(self.undo):
+                    if value is _MISSING:
+                        del row[key]
+                    else:
+                        row[key] = value
+                self.errors += 1
+                raise RuntimeError(ex.__str__())
+            finally:
+                self.undo = None
+            self.commits += 1
+            for op, args in ops:
+                self.operations[op] += 1
+            if self.record:
+                self.log.append(ops)
+
+    def _put(self, row, key, value):
+        self.undo.append((row, key, row.get(key, _MISSING)))
+        row[key] = value
+
+    def _pop(self, row, key):
+        self.undo.append((row, key, row[key]))
+        del row[key]
+
+    def _bridge(self, name):
+        if name not in self.bridges:
+            raise RuntimeError("no bridge named {}".format(name))
+        return self.bridges[name]
+
+    def _port(self, port):
+        if port not in self.ports:
+            raise RuntimeError("no row \"{}\" in table Port".format(port))
+        return self.ports[port]
+
+    def _iface(self, port):
+        if port not in self.ifaces:
+            raise RuntimeError("no row \"{}\" in table Interface".format(port))
+        return self.ifaces[port]
+
+    def _new_port(self, name, port, type=""):
+        if port in self.ports or (port in self.bridges and port != name):
+            raise RuntimeError("cannot create a port named {} because a port named {} already exists"
+                               .format(port, port))
+        self._put(self.ports, port, {"bridge": name, "tag": None, "trunks": frozenset(), "vlan_mode": None})
+        self._put(self.ifaces, port, {"type": type, "options": {}, "ofport_request": None})
+        self._put(self.bridges[name], "ports", self.bridges[name]["ports"] + [port])
+
+    def _add_bridge(self, name):
+        if name in self.bridges or name in self.ports:
+            raise RuntimeError("cannot create a bridge named {} because a bridge named {} already exists"
+                               .format(name, name))
+        self._put(self.bridges, name, {"ports": [], "fail_mode": None})
+        self._new_port(name, name, "internal")
+
+    def _del_bridge(self, name):
+        for port in self._bridge(name)["ports"]:
+            self._pop(self.ports, port)
+            self._pop(self.ifaces, port)
+        self._pop(self.bridges, name)
+
+    def _set_fail_mode(self, name, mode):
+        if mode not in FAIL_MODES:
+            raise RuntimeError("fail-mode must be \"standalone\" or \"secure\"")
+        self._put(self._bridge(name), "fail_mode", mode)
+
+    def _add_port(self, name, port):
+        self._bridge(name)
+        self._new_port(name, port)
+
+    def _del_port(self, name, port):
+        if self._port(port)["bridge"] != name:
+            raise RuntimeError("bridge {} does not have a port {}".format(name, port))
+        self._put(self.bridges[name], "ports", [p for p in self.bridges[name]["ports"] if p != port])
+        self._pop(self.ports, port)
+        self._pop(self.ifaces, port)
+
+    def _set_port_num(self, port, num):
+        num = int(num)
+        if num < 1 or num > 65279:
+            raise RuntimeError("ofport_request {} is outside the valid range 1 to 65279".format(num))
+        self._put(self._iface(port), "ofport_request", num)
+
+    def _set_type_port(self, port, type):
+        if type not in IFACE_TYPES:
+            raise RuntimeError("{}: unknown interface type".format(type))
+        self._put(self._iface(port), "type", type)
+
+    def _set_peer_port(self, port, peer):
+        if peer is None or len("{}".format(peer)) == 0:
+            raise RuntimeError("{}: patch interface requires a peer".format(port))
+        if peer == port:
+            raise RuntimeError("{}: patch interface peer is the same as the interface".format(port))
+        iface = self._iface(port)
+        self._put(iface, "options", dict(iface["options"], peer="{}".format(peer)))
+
+    def _set_vlan_port(self, port, freq):
+        p = self._port(port)
+        self._put(p, "tag", _vlan(freq))
+        self._put(p, "vlan_mode", "dot1q-tunnel")
+
+    def _rem_vlan_port(self, port, freq):
+        p = self._port(port)
+        if p["tag"] == int(freq):
+            self._put(p, "tag", None)
+
+    def _clear_vlan_port(self, port):
+        self._put(self._port(port), "tag", None)
+
+    def _set_trunk_port(self, trunk, tags):
+        self._put(self._port(trunk), "trunks", frozenset(_vlan(t) for t in tags if "{}".format(t) != "[]"))
+
+    def _add_trunk_tag(self, trunk, tag):
+        p = self._port(trunk)
+        self._put(p, "trunks", p["trunks"] | {_vlan(tag)})
+
+    def _rem_trunk_tag(self, trunk, tag):
+        p = self._port(trunk)
+        self._put(p, "trunks", p["trunks"] - {int(tag)})
+
+    def _add_port_patch(self, name, port, num_port, peer=None):
+        self._add_port(name, port)
+        self._set_type_port(port, "patch")
+        if peer is not None:
+            self._set_peer_port(port, peer)
+        self._set_port_num(port, num_port)
+
+    def _read(self, op):
+        self.reads[op] += 1
+
+    def add_bridge(self, name):
+        return self.Transaction().add_bridge(name).commit()
+
+    def del_bridge(self, name):
+        return self.Transaction().del_bridge(name).commit()
+
+    def add_port(self, name, port):
+        return self.Transaction().add_port(name, port).commit()
+
+    def del_port(self, name, port):
+        return self.Transaction().del_port(name, port).commit()
+
+    def set_port_num(self, port, num):
+        return self.Transaction().set_port_num(port, num).commit()
+
+    def set_type_port(self, port, type):
+        return self.Transaction().set_type_port(port, type).commit()
+
+    def set_peer_port(self, port, peer):
+        return self.Transaction().set_peer_port(port, peer).commit()
+
+    def set_vlan_port(self, port, freq):
+        return self.Transaction().set_vlan_port(port, freq).commit()
+
+    def rem_vlan_port(self, port, freq):
+        return self.Transaction().rem_vlan_port(port, freq).commit()
+
+    def clear_vlan_port(self, port):
+        return self.Transaction().clear_vlan_port(port).commit()
+
+    def set_trunk_port(self, trunk, tags):
+        return self.Transaction().set_trunk_port(trunk, tags).commit()
+
+    def add_trunk_tag(self, trunk, tag):
+        return self.Transaction().add_trunk_tag(trunk, tag).commit()
+
+    def rem_trunk_tag(self, trunk, tag):
+        return self.Transaction().rem_trunk_tag(trunk, tag).commit()
+
+    def add_port_patch(self, name, port, num_port, peer=None):
+        return self.Transaction().add_port_patch(name, port, num_port, peer).commit()
+
+    def get_ports(self, br):
+        with self.lock:
+            self._read("get_ports")
+            return sorted(p for p in self._bridge(br)["ports"] if p != br)
+
+    def is_trunk(self, port):
+        with self.lock:
+            self._read("is_trunk")
+            return len(self._port(port)["trunks"]) > 0
+
+    def get_tag_port(self, port):
+        with self.lock:
+            self._read("get_tag_port")
+            tag = self._port(port)["tag"]
+            return "[]" if tag is None else "{}".format(tag)
+
+    def get_trunks_port(self, port):
+        with self.lock:
+            self._read("get_trunks_port")
+            return sorted(self._port(port)["trunks"])
+
+    def get_trunk_ports(self, br):
+        return self._trunks.get_trunk_ports(br)
+
+    def get_tags_br(self, br):
+        return self._trunks.get_tags_br(br)
+
+    def port_to_br(self, port):
+        with self.lock:
+            self._read("port_to_br")
+            return self._port(port)["bridge"]
+
+    def list_bridges(self):
+        with self.lock:
+            self._read("list_bridges")
+            return sorted(self.bridges)
+
+    def exist_bridge(self, name):
+        return name in self.list_bridges()
+
+    def get_tables(self):
+        # rows in OVSDB JSON notation, using the names as uuids
+        def opt(v):
+            return ["set", []] if v is None else v
+
+        with self.lock:
+            self._read("get_tables")
+            bridges = [{"name": n, "ports": ["set", [["uuid", p] for p in b["ports"]]]}
+                       for n, b in self.bridges.items()]
+            ports = [{"_uuid": ["uuid", n], "name": n, "tag": opt(p["tag"])} for n, p in self.ports.items()]
+            ifaces = [{"_uuid": ["uuid", n], "name": n, "type": i["type"],
+                       "options": ["map", sorted(i["options"].items())], "ofport_request": opt(i["ofport_request"])}
+                      for n, i in self.ifaces.items()]
+            return {"Bridge": bridges, "Port": ports, "Interface": ifaces}
+
+    def update_trunk_port(self, br, add=None, remove=None):
+        self._trunks.update_trunk_port(br, add, remove)
+
+    def invalidate_trunks(self, br=None):
+        self._trunks.invalidate_trunks(br)
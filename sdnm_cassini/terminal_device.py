@@ -14,79 +14,164 @@
 #  limitations under the License.                                              +
 # ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
-from sdnm_cassini.utils import make_query
+from sdnm_cassini import accessors
+from sdnm_cassini.model import LogicalChannel
+from sdnm_cassini.utils import iter_items
+from sdnm_cassini.xpath import parse_xpath
 
 MODULE = "openconfig-terminal-device:terminal-device"
 
-"""
-change for regex to cut xpath: 
-get modules: re.compile("([^/ ]+)")
-get index: re.compile("([ \d]+)")
-"""
-def get_index_interfaces(session):
-    module = MODULE
-    submodule = "logical-channels/channel[node()]/index"
-    xpath = "/{}/{}".format(module, submodule)
-    values = make_query(session, xpath, multi=True)
-    ret = []
-    for v in values:
-        s = v.split("index = ")
-        ret.append(s[1])
-    return ret.copy()
-
-
-def get_lch_config_logical_channel(session, index):
-    module = MODULE
-    submodule1 = "logical-channels/channel[index='{}']".format(index)
-    submodule2 = "logical-channel-assignments/assignment[index='{}']/config/logical-channel".format(index)
-    xpath = "/{}/{}/{}".format(module, submodule1, submodule2)
-    values = make_query(session, xpath)
-    if values is None:
-        return None
-    ret = values[0].split("logical-channel = ")
-    return ret[1]
+CHANNEL_LIST = "/{}/logical-channels/channel".format(MODULE)
+
+ASSIGNMENT = "logical-channel-assignments/assignment"
+
+# generated fields of a channel and of its assignment to the LogicalChannel fields
+CHANNEL_FIELDS = {
+    "config_description": "description",
+    "ingress_config_transceiver": "transceiver",
+}
+
+ASSIGNMENT_FIELDS = {
+    "config_assignment_type": "assignment_type",
+    "config_logical_channel": "logical_channel",
+    "config_allocation": "allocation",
+}
+
+
+def _channel_leaves():
+    leaves = {}
+    for leaf, (field, accessor) in accessors.CHANNEL_LEAVES.items():
+        if field in CHANNEL_FIELDS:
+            leaves[leaf] = CHANNEL_FIELDS[field]
+    for leaf, (field, accessor) in accessors.ASSIGNMENT_LEAVES.items():
+        if field in ASSIGNMENT_FIELDS:
+            leaves["{}/{}".format(ASSIGNMENT, leaf)] = ASSIGNMENT_FIELDS[field]
+    return leaves
+
+
+# leaves of a channel subtree, relative to channel[index='x']/
+CHANNEL_LEAVES = _channel_leaves()
+
+CHANNEL = ("terminal-device", "logical-channels", "channel")
+
+CHANNEL_KEY = "index"
+
+# up to this many indices a batch getter reads each channel by its key
+# instead of every channel
+BATCH_KEYED = 8
+
+
+def _get_batch(session, leaf, indices=None):
+    # a few channels are read by key, more with one wildcard query filtered to the wanted ones
+    field = CHANNEL_LEAVES[leaf]
+    wanted = None if indices is None else set(int(i) for i in indices)
+    if wanted is not None and len(wanted) <= BATCH_KEYED:
+        xpaths = ["{}[index='{}']/{}".format(accessors.CHANNEL_ANY, i, leaf) for i in sorted(wanted)]
+    else:
+        xpaths = ["{}/{}".format(accessors.CHANNEL_ANY, leaf)]
+    ret = {}
+    for xpath in xpaths:
+        for v in iter_items(session, xpath):
+            found = _decode(v)
+            if found is None or found[1] != field:
+                continue
+            if wanted is None or found[0] in wanted:
+                ret[found[0]] = found[2]
+    return ret
+
+
+def get_config_descriptions(session, indices=None):
+    """
+    Descriptions of the channels in indices, or of every channel, keyed by
+    index, with one query per channel for a few indices and a single query
+    otherwise. Channels without the leaf are left out.
+    """
+    return _get_batch(session, "config/description", indices)
+
 
+def get_ing_config_transceivers(session, indices=None):
+    return _get_batch(session, "ingress/config/transceiver", indices)
 
-def get_lch_config_allocation(session, index):
-    module = MODULE
-    submodule1 = "logical-channels/channel[index='{}']".format(index)
-    submodule2 = "logical-channel-assignments/assignment[index='{}']/config/allocation".format(index)
-    xpath = "/{}/{}/{}".format(module, submodule1, submodule2)
-    values = make_query(session, xpath)
-    if values is None:
+
+def get_lch_config_assignment_types(session, indices=None):
+    return _get_batch(session, "logical-channel-assignments/assignment/config/assignment-type", indices)
+
+
+def get_lch_config_logical_channels(session, indices=None):
+    return _get_batch(session, "logical-channel-assignments/assignment/config/logical-channel", indices)
+
+
+def get_lch_config_allocations(session, indices=None):
+    return _get_batch(session, "logical-channel-assignments/assignment/config/allocation", indices)
+
+
+def channel_leaf(xpath):
+    """
+    Returns (index, field) of a LogicalChannel leaf xpath, (index, None) for the
+    channel entry itself or its index key and None for anything else.
+    """
+    path = parse_xpath(xpath)
+    if path is None or path.segments[:3] != CHANNEL or "channel" not in path.keys:
         return None
-    s = values[0].split("allocation = ")
-    return s[1]
-
-def get_lch_config_assignment_type(session, index):
-    module = MODULE
-    submodule1 = "logical-channels/channel[index='{}']".format(index)
-    submodule2 = "logical-channel-assignments/assignment[index='{}']/config/assignment-type".format(index)
-    xpath = "/{}/{}/{}".format(module, submodule1, submodule2)
-    values = make_query(session, xpath)
-    if values is None:
+    index = path.keys["channel"]
+    if path.segments[3:] in ((), (CHANNEL_KEY,)):
+        return int(index), None
+    # only the assignment named after the channel is used
+    if path.keys.get("assignment", index) != index:
         return None
-    s = values[0].split("assignment-type = ")
-    return s[1]
-
-def get_ing_config_transceiver(session, index):
-    module = MODULE
-    submodule = "logical-channels/channel[index='{}']/ingress/config/transceiver".format(index)
-    xpath = "/{}/{}".format(module, submodule)
-    values = make_query(session, xpath)
-    if values is None:
+    name = CHANNEL_LEAVES.get("/".join(path.segments[3:]))
+    if name is None:
         return None
-    s = values[0].split("transceiver = ")
-    return s[1]
+    return int(index), name
 
 
-def get_config_description(session, index):
-    module = MODULE
-    submodule = "logical-channels/channel[index='{}']/config/description".format(index)
-    xpath = "/{}/{}".format(module, submodule)
-    values = make_query(session,xpath)
-    if values is None:
-        return None
-    s = values[0].split("description = ")
-    return s[1]
+def new_channel(index, **fields):
+    return LogicalChannel(index).replace(**fields)
+
+
+def _decode(v):
+    """
+    Returns (index, field, value) of a LogicalChannel leaf decoded by the
+    generated accessors, None for anything else.
+    """
+    found = accessors.decode_assignment(v)
+    if found is not None:
+        (index, assignment), field, value = found
+        # only the assignment named after the channel is used
+        if index != assignment:
+            return None
+        name = ASSIGNMENT_FIELDS.get(field)
+    else:
+        found = accessors.decode_channel(v)
+        if found is None:
+            return None
+        index, field, value = found
+        name = CHANNEL_FIELDS.get(field)
+    return None if name is None else (index, name, value)
+
+
+def _load_channels(session, xpath):
+    fields = {}
+    for v in iter_items(session, xpath):
+        found = _decode(v)
+        if found is not None:
+            fields.setdefault(found[0], {})[found[1]] = found[2]
+
+    ret = {}
+    for index, f in fields.items():
+        ret[index] = new_channel(index, **f)
+    return ret
+
+
+def get_logical_channels(session):
+    """
+    Loads the whole logical-channels subtree with one query and returns the
+    channel records keyed by index.
+    """
+    xpath = "/{}/logical-channels/channel//*".format(MODULE)
+    return _load_channels(session, xpath)
+
 
+def get_logical_channel(session, index):
+    xpath = "/{}/logical-channels/channel[index='{}']//*".format(MODULE, index)
+    return _load_channels(session, xpath).get(int(index))
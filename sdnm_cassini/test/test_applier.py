@@ -0,0 +1,105 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import threading
+import unittest
+
+from sdnm_cassini.applier import APPLIED, FAILED, QUEUED, Applier
+
+
+class Changes(object):
+    # the part of a ChangeSet the applier uses
+
+    def __init__(self, ports, log, name):
+        self._ports = ports
+        self.log = log
+        self.name = name
+
+    def ports(self):
+        return set(self._ports)
+
+    def commit(self):
+        self.log.append(self.name)
+
+
+class ApplierTest(unittest.TestCase):
+
+    def setUp(self):
+        self.applier = Applier(lanes=4, size=8)
+
+    def tearDown(self):
+        self.applier.stop()
+
+    def test_submit_applies_in_order(self):
+        log = []
+        tickets = [self.applier.submit(Changes(["p1"], log, i)) for i in range(20)]
+        self.assertEqual(self.applier.wait(tickets[-1], 5), APPLIED)
+        self.assertEqual(log, list(range(20)))
+        self.assertEqual(self.applier.pending(), 0)
+
+    def test_failure_is_kept_on_the_ticket(self):
+        def fail():
+            raise RuntimeError("boom")
+
+        ticket = self.applier.execute(["p1"], fail)
+        self.assertEqual(self.applier.wait(ticket, 5), FAILED)
+        self.assertEqual(str(self.applier.error(ticket)), "boom")
+        # the lane keeps going
+        ticket = self.applier.execute(["p1"], lambda: None)
+        self.assertEqual(self.applier.wait(ticket, 5), APPLIED)
+
+    def test_lanes_run_in_parallel(self):
+        keys = ["p{}".format(i) for i in range(64)]
+        a = next(k for k in keys if self.applier.lane_of(k) == 0)
+        b = next(k for k in keys if self.applier.lane_of(k) == 1)
+        release = threading.Event()
+        blocked = self.applier.execute([a], release.wait, 5)
+        other = self.applier.execute([b], lambda: None)
+        self.assertEqual(self.applier.wait(other, 5), APPLIED)
+        self.assertEqual(self.applier.status(blocked), QUEUED)
+        release.set()
+        self.assertEqual(self.applier.wait(blocked, 5), APPLIED)
+
+    def test_barrier_waits_for_every_lane(self):
+        keys = ["p{}".format(i) for i in range(64)]
+        a = next(k for k in keys if self.applier.lane_of(k) == 0)
+        b = next(k for k in keys if self.applier.lane_of(k) == 1)
+        log = []
+        release = threading.Event()
+        self.applier.execute([a], release.wait, 5)
+        both = self.applier.submit(Changes([a, b], log, "both"))
+        after = self.applier.submit(Changes([b], log, "after"))
+        self.assertEqual(self.applier.wait(after, 0.2), QUEUED)
+        release.set()
+        self.assertEqual(self.applier.wait(after, 5), APPLIED)
+        self.assertEqual(self.applier.status(both), APPLIED)
+        self.assertEqual(log, ["both", "after"])
+        self.assertTrue(self.applier.barrier(timeout=5))
+
+    def test_key_groups_ports_in_one_lane(self):
+        applier = Applier(lanes=4, size=8, key=lambda port: port.split("/")[0])
+        try:
+            log = []
+            for i in range(10):
+                applier.submit(Changes(["br1/p{}".format(i)], log, i))
+            applier.join()
+            self.assertEqual(log, list(range(10)))
+        finally:
+            applier.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import unittest
+
+from sdnm_cassini.simswitch import SimulatedSwitch
+
+try:
+    import sysrepo as sr
+    from sdnm_cassini.changeset import ChangeSet, net_changes
+    from sdnm_cassini.xpath import Change
+except ImportError:
+    sr = None
+
+
+def _change(oper, xpath, old, new):
+    return Change(oper, xpath, None, None, None, None, None, old, new)
+
+
+@unittest.skipIf(sr is None, "sysrepo is not installed")
+class NetChangesTest(unittest.TestCase):
+
+    def test_first_old_and_last_new_value(self):
+        x = "/m:c/leaf"
+        net = net_changes([_change(sr.SR_OP_MODIFIED, x, 1, 2), _change(sr.SR_OP_MODIFIED, x, 2, 3)])
+        self.assertEqual([(ch.oper, ch.old, ch.new) for ch in net], [(sr.SR_OP_MODIFIED, 1, 3)])
+
+    def test_round_trip_is_dropped(self):
+        x = "/m:c/leaf"
+        net = net_changes([_change(sr.SR_OP_MODIFIED, x, 1, 2), _change(sr.SR_OP_MODIFIED, x, 2, 1)])
+        self.assertEqual(net, [])
+
+    def test_operation_follows_the_values(self):
+        x = "/m:c/leaf"
+        net = net_changes([_change(sr.SR_OP_CREATED, x, None, 1), _change(sr.SR_OP_DELETED, x, 1, None),
+                           _change(sr.SR_OP_CREATED, "/m:c/other", None, 5)])
+        self.assertEqual([(ch.xpath, ch.oper) for ch in net], [("/m:c/other", sr.SR_OP_CREATED)])
+
+
+@unittest.skipIf(sr is None, "sysrepo is not installed")
+class ChangeSetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sw = SimulatedSwitch()
+        tx = self.sw.Transaction()
+        tx.add_bridge("br1")
+        tx.add_port("br1", "p1")
+        tx.add_port("br1", "p2")
+        tx.commit()
+        self.sw.reset_stats()
+
+    def test_nothing_is_written_before_commit(self):
+        cs = ChangeSet(self.sw)
+        cs.set_vlan_port("p1", 100)
+        cs.defer(self.fail, "deferred call ran")
+        self.assertEqual(self.sw.commits, 0)
+        self.assertEqual(len(cs), 2)
+
+    def test_last_write_of_a_column_wins(self):
+        cs = ChangeSet(self.sw)
+        cs.set_vlan_port("p1", 100)
+        cs.set_peer_port("p1", "p2")
+        cs.set_vlan_port("p1", 200)
+        cs.commit()
+        self.assertEqual(self.sw.commits, 1)
+        self.assertEqual(self.sw.operations["set_vlan_port"], 1)
+        self.assertEqual(self.sw.get_tag_port("p1"), "200")
+
+    def test_other_calls_are_kept_in_order(self):
+        cs = ChangeSet(self.sw)
+        cs.add_port("br1", "p3")
+        cs.set_type_port("p3", "patch")
+        cs.del_port("br1", "p3")
+        cs.commit()
+        self.assertEqual(self.sw.get_ports("br1"), ["p1", "p2"])
+
+    def test_deferred_calls_run_after_the_transaction(self):
+        cs = ChangeSet(self.sw)
+        seen = []
+        cs.set_vlan_port("p1", 100)
+        cs.defer(lambda: seen.append(self.sw.get_tag_port("p1")))
+        cs.commit()
+        self.assertEqual(seen, ["100"])
+        self.assertEqual(len(cs), 0)
+
+    def test_ports_and_links(self):
+        cs = ChangeSet(self.sw)
+        cs.set_peer_port("p1", "p2")
+        cs.touch("p9")
+        cs.link(1, 10)
+        cs.link(2, 10)
+        cs.link(1, 0)
+        self.assertEqual(cs.ports(), {"p1", "p9"})
+        self.assertEqual(list(cs.links.items()), [(2, 10), (1, 0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
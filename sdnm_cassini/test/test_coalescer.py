@@ -0,0 +1,81 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import time
+import unittest
+
+from sdnm_cassini.coalescer import Coalescer
+from sdnm_cassini.simswitch import SimulatedSwitch
+
+
+class CoalescerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sw = SimulatedSwitch()
+        tx = self.sw.Transaction()
+        tx.add_bridge("br1")
+        tx.add_port("br1", "p1")
+        tx.add_port("br1", "p2")
+        tx.commit()
+        self.sw.reset_stats()
+        self.applied = []
+        self.co = Coalescer(self.sw, 0.05, on_apply=lambda *call: self.applied.append(call))
+
+    def tune(self, port, vlan, old=None):
+        self.co.write("port", port, "tag", "set_vlan_port", port, vlan, old=old)
+
+    def test_timer_flushes_the_window(self):
+        self.tune("p1", 100)
+        self.assertEqual(self.sw.commits, 0)
+        deadline = time.monotonic() + 5
+        while self.sw.commits == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.sw.commits, 1)
+        self.assertEqual(self.sw.get_tag_port("p1"), "100")
+        self.assertIsNone(self.co.timer)
+
+    def test_last_write_of_a_column_wins(self):
+        for vlan in (100, 200, 300):
+            self.tune("p1", vlan)
+        self.tune("p2", 400)
+        self.co.write("port", "p1", "trunks", "set_trunk_port", "p1", [500])
+        self.co.flush()
+        self.assertEqual(self.sw.commits, 1)
+        self.assertEqual(self.sw.operations["set_vlan_port"], 2)
+        self.assertEqual(self.sw.get_tag_port("p1"), "300")
+        self.assertEqual(self.sw.get_trunks_port("p1"), [500])
+
+    def test_on_apply_gets_the_old_value_of_the_window(self):
+        self.tune("p1", 100, old=10)
+        self.tune("p1", 200, old=100)
+        self.tune("p2", 300, old=20)
+        self.co.flush()
+        self.assertEqual(self.applied, [(("port", "p1", "tag"), 10, "set_vlan_port", ("p1", 200)),
+                                        (("port", "p2", "tag"), 20, "set_vlan_port", ("p2", 300))])
+
+    def test_failed_flush_is_not_applied(self):
+        self.tune("p1", 100)
+        self.tune("p9", 200)
+        with self.assertRaises(RuntimeError):
+            self.co.flush()
+        self.assertEqual(self.sw.get_tag_port("p1"), "[]")
+        self.assertEqual(self.applied, [])
+        self.co.flush()
+        self.assertEqual(self.sw.errors, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
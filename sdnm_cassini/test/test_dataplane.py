@@ -0,0 +1,229 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import logging
+import unittest
+
+from sdnm_cassini.simswitch import SimulatedSwitch
+
+try:
+    import sysrepo as sr
+    import sdnm_cassini.terminal_device as td
+    from sdnm_cassini.cache import ConfigCache
+    from sdnm_cassini.dataplane import CassiniDataPlane
+    from sdnm_cassini.xpath import Change, parse_xpath
+except ImportError:
+    sr = None
+
+FREQUENCY = ("/openconfig-platform:components/component[name='{}']/"
+             "openconfig-terminal-device:optical-channel/config/frequency")
+ASSIGNMENT = ("/openconfig-terminal-device:terminal-device/logical-channels/channel[index='{0}']/"
+              "logical-channel-assignments/assignment[index='{0}']/config/logical-channel")
+
+# channel index: (description, transceiver, assignment type)
+CHANNELS = {
+    1: ("xe1/1", "xe1", "LOGICAL_CHANNEL"),
+    2: ("xe1/2", "xe1", "LOGICAL_CHANNEL"),
+    11: ("oe1/1", "oe1", "OPTICAL_CHANNEL"),
+    12: ("oe1/2", "oe1", "OPTICAL_CHANNEL"),
+}
+
+
+class EmptySession(object):
+    # a datastore without data, reads of channels outside the cache find nothing
+
+    def get_item(self, xpath):
+        return None
+
+    def get_items_iter(self, xpath):
+        return None
+
+
+def change(oper, xpath, old, new):
+    path = parse_xpath(xpath)
+    return Change(oper, xpath, path.module, path.segments, path.keys, path.leaf, path.schema, old, new)
+
+
+def dataplane(links=None):
+    """
+    A CassiniDataPlane on a SimulatedSwitch holding the ports of CHANNELS, with
+    the cache primed and no sysrepo connection; links maps client to line.
+    """
+    links = links or {}
+    sw = SimulatedSwitch()
+    tx = sw.Transaction()
+    for br in ("xe1", "oe1"):
+        tx.add_bridge(br)
+    channels = {}
+    for index, (desc, br, kind) in CHANNELS.items():
+        line = links.get(index, 0)
+        peer = "none"
+        if line != 0:
+            peer = CHANNELS[line][0]
+        elif index in links.values():
+            peer = next(CHANNELS[c][0] for c, l in links.items() if l == index)
+        tx.add_port_patch(br, desc, index, peer)
+        channels[index] = td.new_channel(index, description=desc, transceiver=br, assignment_type=kind,
+                                         logical_channel=line)
+    tx.commit()
+    sw.reset_stats()
+
+    dp = object.__new__(CassiniDataPlane)
+    dp.logger = logging.getLogger("test")
+    dp.ovs = sw
+    dp.flows = None
+    dp.coalescer = None
+    dp.applier = None
+    dp.handlers = {}
+    dp.subtrees = []
+    dp.plans = {}
+    dp.cache = ConfigCache(EmptySession())
+    dp.cache._reset(channels)
+    dp.cache.components = {}
+    dp.register_handler(dp.FREQUENCY, dp.update_frequency, dp.FREQUENCY_XPATH)
+    dp.register_handler(dp.ASSIGNMENT, dp.update_assignment)
+    return dp
+
+
+def edit(dp, event, changes):
+    dp.read_changes = lambda sess, xpath: changes
+    return dp.handle_changes(None, "edit", event)
+
+
+def peers(dp):
+    return dict((port, dp.ovs.ifaces[port]["options"]["peer"]) for port, _, _ in CHANNELS.values())
+
+
+@unittest.skipIf(sr is None, "sysrepo is not installed")
+class VerifyApplyTest(unittest.TestCase):
+
+    def test_verify_rejects_a_component_without_port(self):
+        dp = dataplane()
+        changes = [change(sr.SR_OP_CREATED, FREQUENCY.format("oe9/1"), None, 193500000)]
+        self.assertEqual(edit(dp, sr.SR_EV_VERIFY, changes), sr.SR_ERR_VALIDATION_FAILED)
+
+    def test_verify_accepts_a_component_with_port(self):
+        dp = dataplane()
+        changes = [change(sr.SR_OP_CREATED, FREQUENCY.format("oe1/1"), None, 193500000)]
+        self.assertEqual(edit(dp, sr.SR_EV_VERIFY, changes), sr.SR_ERR_OK)
+        self.assertEqual(len(dp.plans["edit"]), 2)
+
+    def test_verify_rejects_a_frequency_without_vlan(self):
+        dp = dataplane()
+        changes = [change(sr.SR_OP_CREATED, FREQUENCY.format("oe1/1"), None, 1)]
+        self.assertEqual(edit(dp, sr.SR_EV_VERIFY, changes), sr.SR_ERR_VALIDATION_FAILED)
+
+    def test_apply_commits_the_verified_plan(self):
+        dp = dataplane()
+        changes = [change(sr.SR_OP_MODIFIED, ASSIGNMENT.format(1), 0, 11)]
+        self.assertEqual(edit(dp, sr.SR_EV_VERIFY, changes), sr.SR_ERR_OK)
+        self.assertEqual(dp.ovs.commits, 0)
+        edit(dp, sr.SR_EV_APPLY, changes)
+        self.assertEqual(dp.ovs.commits, 1)
+        self.assertEqual(dp.ovs.ifaces["xe1/1"]["options"]["peer"], "oe1/1")
+        self.assertEqual(dp.cache.clients_of(11), [1])
+
+    def test_failed_commit_leaves_the_cache(self):
+        dp = dataplane()
+        changes = [change(sr.SR_OP_MODIFIED, ASSIGNMENT.format(1), 0, 11)]
+        edit(dp, sr.SR_EV_VERIFY, changes)
+        dp.ovs.del_port("oe1", "oe1/1")
+        self.assertEqual(edit(dp, sr.SR_EV_APPLY, changes), sr.SR_ERR_OK)
+        self.assertEqual(dp.ovs.errors, 1)
+        self.assertEqual(dp.cache.clients_of(11), [])
+        self.assertEqual(dp.cache.channel(1).logical_channel, 0)
+
+    def test_unplanned_apply_leaves_the_cache(self):
+        dp = dataplane()
+        changes = [change(sr.SR_OP_MODIFIED, ASSIGNMENT.format(1), 0, 99)]
+        self.assertEqual(edit(dp, sr.SR_EV_APPLY, changes), sr.SR_ERR_OK)
+        self.assertEqual(dp.ovs.commits, 0)
+        self.assertEqual(dp.cache.channel(1).logical_channel, 0)
+
+    def test_abort_drops_the_plan(self):
+        dp = dataplane()
+        changes = [change(sr.SR_OP_MODIFIED, ASSIGNMENT.format(1), 0, 11)]
+        edit(dp, sr.SR_EV_VERIFY, changes)
+        edit(dp, sr.SR_EV_ABORT, changes)
+        self.assertEqual(dp.plans, {})
+        self.assertEqual(dp.ovs.commits, 0)
+
+
+@unittest.skipIf(sr is None, "sysrepo is not installed")
+class SubscriptionTest(unittest.TestCase):
+
+    def test_one_subtree_per_module(self):
+        dp = dataplane()
+        dp.subtrees = []
+        for xpath in ConfigCache.subtrees():
+            dp.watch(xpath)
+        dp.watch(dp.FREQUENCY_XPATH)
+        dp.watch(dp.ASSIGNMENT)
+        self.assertEqual(dp.subtrees, ConfigCache.subtrees())
+
+    def test_subtree_replaces_the_nodes_it_holds(self):
+        dp = dataplane()
+        self.assertEqual(dp.subtrees, [dp.FREQUENCY_XPATH, dp.ASSIGNMENT])
+        dp.watch(td.CHANNEL_LIST)
+        self.assertEqual(dp.subtrees, [dp.FREQUENCY_XPATH, td.CHANNEL_LIST])
+
+    def test_edit_of_many_leaves_is_one_transaction(self):
+        dp = dataplane()
+        changes = [change(sr.SR_OP_MODIFIED, ASSIGNMENT.format(1), 0, 11),
+                   change(sr.SR_OP_MODIFIED, ASSIGNMENT.format(2), 0, 12),
+                   change(sr.SR_OP_MODIFIED, td.CHANNEL_LIST + "[index='1']/config/rate-class", None, "x")]
+        edit(dp, sr.SR_EV_VERIFY, changes)
+        edit(dp, sr.SR_EV_APPLY, changes)
+        self.assertEqual(dp.ovs.commits, 1)
+        self.assertEqual(peers(dp), {"xe1/1": "oe1/1", "xe1/2": "oe1/2", "oe1/1": "xe1/1", "oe1/2": "xe1/2"})
+
+
+@unittest.skipIf(sr is None, "sysrepo is not installed")
+class PlanPeersTest(unittest.TestCase):
+
+    def assign(self, dp, *moves):
+        changes = [change(sr.SR_OP_MODIFIED, ASSIGNMENT.format(c), old, new) for c, old, new in moves]
+        self.assertEqual(edit(dp, sr.SR_EV_VERIFY, changes), sr.SR_ERR_OK)
+        self.assertEqual(edit(dp, sr.SR_EV_APPLY, changes), sr.SR_ERR_OK)
+
+    def test_reassigned_client_releases_its_old_line(self):
+        dp = dataplane({1: 11})
+        self.assign(dp, (1, 11, 12))
+        self.assertEqual(peers(dp), {"xe1/1": "oe1/2", "xe1/2": "none", "oe1/1": "none", "oe1/2": "xe1/1"})
+        self.assertEqual(dp.ovs.operations["set_peer_port"], 3)
+        self.assertEqual(dp.cache.clients_of(12), [1])
+
+    def test_line_is_taken_from_its_client(self):
+        dp = dataplane({1: 11})
+        self.assign(dp, (2, 0, 11))
+        self.assertEqual(peers(dp), {"xe1/1": "none", "xe1/2": "oe1/1", "oe1/1": "xe1/2", "oe1/2": "none"})
+
+    def test_swap_in_one_edit(self):
+        dp = dataplane({1: 11, 2: 12})
+        self.assign(dp, (1, 11, 12), (2, 12, 11))
+        self.assertEqual(peers(dp), {"xe1/1": "oe1/2", "xe1/2": "oe1/1", "oe1/1": "xe1/2", "oe1/2": "xe1/1"})
+        self.assertEqual(dp.ovs.commits, 1)
+
+    def test_clear_unlinks_both_ends(self):
+        dp = dataplane({1: 11, 2: 12})
+        self.assign(dp, (1, 11, 0))
+        self.assertEqual(peers(dp), {"xe1/1": "none", "xe1/2": "oe1/2", "oe1/1": "none", "oe1/2": "xe1/2"})
+        self.assertEqual(dp.ovs.operations["set_peer_port"], 2)
+        self.assertEqual(dp.cache.clients_of(11), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import unittest
+
+from sdnm_cassini.metrics import command_verb
+
+# command line: key
+COMMANDS = [
+    (["ovs-vsctl", "list-br"], "list-br"),
+    (["ovs-vsctl", "--timeout", "5", "add-br", "br1"], "add-br"),
+    (["ovs-vsctl", "--timeout=5", "del-port", "br1", "p1"], "del-port"),
+    (["ovs-vsctl", "-t", "5", "--db", "unix:/var/run/openvswitch/db.sock", "get", "Port", "p1", "tag"], "get Port"),
+    (["ovs-vsctl", "--format", "json", "list", "Interface"], "list Interface"),
+    (["ovs-ofctl", "-O", "OpenFlow14", "add-flow", "xc", "in_port=1,actions=output:2"], "ofctl add-flow"),
+    (["ovs-ofctl", "--protocols", "OpenFlow14", "dump-flows", "xc"], "ofctl dump-flows"),
+    (["ovs-ofctl", "--bundle", "add-flows", "xc", "-"], "ofctl add-flows"),
+    (["ovs-ofctl", "-O", "OpenFlow14", "--bundle", "--strict", "del-flows", "xc", "in_port=1"], "ofctl del-flows"),
+    (["ovs-vsctl", "--", "add-port", "br1", "p1", "--", "set", "Interface", "p1", "type=patch",
+      "--", "set", "Interface", "p1", "options:peer=p2"], "add-port+set Interface"),
+    (["ovs-vsctl", "--timeout", "5", "--", "--may-exist", "add-br", "br1",
+      "--", "set", "Bridge", "br1", "fail_mode=secure"], "add-br+set Bridge"),
+    (["ovs-vsctl", "set", "Port", "p1", "tag=5", "--", "clear", "Port", "p2", "tag",
+      "--", "set", "Port", "p3", "tag=6"], "set Port+clear Port+set Port"),
+]
+
+
+class CommandVerbTest(unittest.TestCase):
+
+    def test_command_verb(self):
+        for cmd, key in COMMANDS:
+            with self.subTest(cmd=" ".join(cmd)):
+                self.assertEqual(command_verb(cmd), key)
+
+
+if __name__ == '__main__':
+    unittest.main()
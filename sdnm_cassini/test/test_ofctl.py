@@ -0,0 +1,100 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import unittest
+from unittest import mock
+
+from sdnm_cassini import ofctl
+
+
+def _out(client, line, vlan):
+    return ("cookie={},priority={},in_port={},actions=push_vlan:0x8100,mod_vlan_vid:{},output:{}"
+            .format(ofctl.COOKIE, ofctl.PRIORITY, client, vlan, line))
+
+
+def _in(client, line, vlan):
+    return "cookie={},priority={},in_port={},dl_vlan={},actions=pop_vlan,output:{}".format(
+        ofctl.COOKIE, ofctl.PRIORITY, line, vlan, client)
+
+
+class FlowPlanTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(ofctl, "bundle")
+        self.bundle = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.plan = ofctl.FlowPlan("xc")
+        for port, num in (("xe1/1", 1), ("xe1/2", 2), ("oe1/1", 11), ("oe1/2", 12)):
+            self.plan.add_port(port, num)
+        self.plan.set_vlan("oe1/1", 100)
+        self.plan.set_vlan("oe1/2", 200)
+        self.plan.connect("xe1/1", "oe1/1")
+        self.plan.connect("xe1/2", "oe1/2")
+        self.plan.commit()
+        self.bundle.reset_mock()
+
+    def sent(self):
+        self.assertEqual(self.bundle.call_count, 1)
+        br, command, lines = self.bundle.call_args[0]
+        self.assertEqual((br, command), ("xc", "add-flows"))
+        return lines
+
+    def test_commit_deletes_the_old_flows_and_adds_the_new(self):
+        self.plan.set_vlan("oe1/1", 300)
+        self.plan.commit()
+        self.assertEqual(self.sent(), [
+            "delete_strict priority=100,in_port=1",
+            "delete_strict priority=100,in_port=11,dl_vlan=100",
+            "add " + _out(1, 11, 300),
+            "add " + _in(1, 11, 300),
+        ])
+
+    def test_vlan_change_marks_only_its_client(self):
+        self.plan.set_vlan("oe1/2", 400)
+        self.assertEqual(self.plan.dirty, {"xe1/2"})
+        # a line without client has no flows to rewrite
+        self.plan.disconnect("xe1/1")
+        self.plan.commit()
+        self.bundle.reset_mock()
+        self.plan.set_vlan("oe1/1", 500)
+        self.assertEqual(self.plan.dirty, set())
+        self.assertIsNone(self.plan.commit())
+        self.bundle.assert_not_called()
+
+    def test_connect_steals_the_line(self):
+        self.plan.connect("xe1/2", "oe1/1")
+        self.assertEqual(self.plan.clients, {"xe1/2": "oe1/1"})
+        self.assertEqual(self.plan.lines, {"oe1/1": "xe1/2"})
+        self.plan.commit()
+        # the flows of the old client go before the ones taking its line
+        self.assertEqual(self.sent(), [
+            "delete_strict priority=100,in_port=1",
+            "delete_strict priority=100,in_port=11,dl_vlan=100",
+            "delete_strict priority=100,in_port=2",
+            "delete_strict priority=100,in_port=12,dl_vlan=200",
+            "add " + _out(2, 11, 100),
+            "add " + _in(2, 11, 100),
+        ])
+        self.assertEqual(self.plan.installed["xe1/1"], [])
+
+    def test_unchanged_plan_sends_nothing(self):
+        self.plan.connect("xe1/1", "oe1/1")
+        self.assertIsNone(self.plan.commit())
+        self.bundle.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,432 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import copy
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+
+from sdnm_cassini import ovsdb
+
+# column kinds of the tables the client writes, the others are atoms
+COLUMNS = {
+    "Open_vSwitch": {"bridges": "set"},
+    "Bridge": {"ports": "set", "fail_mode": "set"},
+    "Port": {"interfaces": "set", "tag": "set", "trunks": "set", "vlan_mode": "set"},
+    "Interface": {"options": "map", "ofport_request": "set"},
+}
+
+DEFAULTS = {"set": ["set", []], "map": ["map", []]}
+
+# references followed by the garbage collection, from the root table
+REFERENCES = (("Open_vSwitch", "bridges", "Bridge"), ("Bridge", "ports", "Port"), ("Port", "interfaces", "Interface"))
+
+
+def _elements(value):
+    if isinstance(value, list) and value[0] == "set":
+        return list(value[1])
+    return [value]
+
+
+def _out(value):
+    # like ovsdb-server, a set of one element is sent as the element
+    if isinstance(value, list) and value[0] == "set" and len(value[1]) == 1:
+        return value[1][0]
+    return value
+
+
+class OvsdbError(Exception):
+    pass
+
+
+class StandInServer(object):
+    """
+    The part of ovsdb-server the client uses, over a unix socket: "transact"
+    with insert, select, update, mutate, delete and wait, atomic and followed
+    by the garbage collection of unreferenced rows, and "monitor" with its
+    initial contents and the "update" notification of every change.
+    """
+
+    def __init__(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "db.sock")
+        self.tables = {"Open_vSwitch": {str(uuid.uuid4()): {"bridges": ["set", []]}},
+                       "Bridge": {}, "Port": {}, "Interface": {}}
+        self.conns = []
+        self.monitors = []
+        self.lock = threading.Lock()
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.path)
+        self.listener.listen(4)
+        t = threading.Thread(target=self._accept)
+        t.daemon = True
+        t.start()
+
+    def stop(self):
+        if self.listener is None:
+            return
+        self.drop()
+        self.listener.close()
+        self.listener = None
+        shutil.rmtree(self.dir)
+
+    def drop(self):
+        with self.lock:
+            conns = self.conns
+            self.conns = []
+            self.monitors = []
+        for c in conns:
+            try:
+                c.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            c.close()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, addr = self.listener.accept()
+            except OSError:
+                return
+            with self.lock:
+                self.conns.append(conn)
+            t = threading.Thread(target=self._serve, args=(conn,))
+            t.daemon = True
+            t.start()
+
+    def _serve(self, conn):
+        decoder = json.JSONDecoder()
+        buf = ""
+        while True:
+            try:
+                data = conn.recv(65536)
+            except OSError:
+                return
+            if len(data) == 0:
+                return
+            buf += data.decode("utf-8")
+            while True:
+                buf = buf.lstrip()
+                try:
+                    msg, end = decoder.raw_decode(buf)
+                except ValueError:
+                    break
+                buf = buf[end:]
+                self._handle(conn, msg)
+
+    def _send(self, conn, msg):
+        try:
+            conn.sendall(json.dumps(msg).encode("utf-8"))
+        except OSError:
+            pass
+
+    def _handle(self, conn, msg):
+        if msg["method"] == "monitor":
+            monitor_id, requests = msg["params"][1:]
+            with self.lock:
+                self.monitors.append((conn, monitor_id, requests))
+                result = self._changes(requests, {}, self.tables)
+            self._send(conn, {"id": msg["id"], "result": result, "error": None})
+        elif msg["method"] == "transact":
+            self._send(conn, {"id": msg["id"], "result": self.transact(msg["params"][1:]), "error": None})
+
+    def transact(self, ops):
+        with self.lock:
+            before = copy.deepcopy(self.tables)
+            named = {}
+            result = []
+            try:
+                for op in ops:
+                    result.append(getattr(self, "_" + op["op"])(op, named))
+                self._collect()
+            except OvsdbError as ex:
+                self.tables = before
+                result.append({"error": ex.args[0], "details": ex.args[1]})
+                return result
+            # notifications go out before the reply, as ovsdb-server does
+            for conn, monitor_id, requests in self.monitors:
+                updates = self._changes(requests, before, self.tables)
+                if len(updates) > 0:
+                    self._send(conn, {"method": "update", "params": [monitor_id, updates], "id": None})
+        return result
+
+    def _changes(self, requests, old, new):
+        updates = {}
+        for table, request in requests.items():
+            columns = request["columns"]
+            rows = {}
+            was = old.get(table, {})
+            now = new[table]
+            for u in set(was) | set(now):
+                a = was.get(u)
+                b = now.get(u)
+                if a == b:
+                    continue
+                change = {}
+                if a is not None:
+                    change["old"] = self._project(table, a, columns)
+                if b is not None:
+                    change["new"] = self._project(table, b, columns)
+                rows[u] = change
+            if len(rows) > 0:
+                updates[table] = rows
+        return updates
+
+    def _project(self, table, row, columns):
+        return dict((c, _out(row.get(c, DEFAULTS.get(COLUMNS[table].get(c), "")))) for c in columns)
+
+    def _rows(self, op):
+        ret = []
+        for u, row in self.tables[op["table"]].items():
+            if all(self._match(row, c, f, v) for c, f, v in op["where"]):
+                ret.append((u, row))
+        return ret
+
+    def _match(self, row, column, function, value):
+        if function == "==":
+            return row.get(column) == value
+        if function == "includes":
+            return all(v in _elements(row.get(column)) for v in _elements(value))
+        raise OvsdbError("unknown function", function)
+
+    def _resolve(self, value, named):
+        if isinstance(value, list):
+            if len(value) == 2 and value[0] == "named-uuid":
+                return ["uuid", named[value[1]]]
+            return [self._resolve(v, named) for v in value]
+        if isinstance(value, dict):
+            return dict((k, self._resolve(v, named)) for k, v in value.items())
+        return value
+
+    def _column(self, table, column, value):
+        kind = COLUMNS[table].get(column)
+        if kind == "set" and not (isinstance(value, list) and value[0] == "set"):
+            return ["set", [value]]
+        return value
+
+    def _insert(self, op, named):
+        u = str(uuid.uuid4())
+        if "uuid-name" in op:
+            named[op["uuid-name"]] = u
+        row = {}
+        for column, kind in COLUMNS[op["table"]].items():
+            row[column] = copy.deepcopy(DEFAULTS[kind])
+        for column, value in self._resolve(op["row"], named).items():
+            row[column] = self._column(op["table"], column, value)
+        self.tables[op["table"]][u] = row
+        return {"uuid": ["uuid", u]}
+
+    def _select(self, op, named):
+        found = []
+        for u, row in self._rows(op):
+            r = dict(row, _uuid=["uuid", u])
+            columns = op.get("columns", list(r))
+            found.append(dict((c, _out(r.get(c))) for c in columns))
+        return {"rows": found}
+
+    def _update(self, op, named):
+        rows = self._rows(op)
+        for u, row in rows:
+            for column, value in self._resolve(op["row"], named).items():
+                row[column] = self._column(op["table"], column, value)
+        return {"count": len(rows)}
+
+    def _mutate(self, op, named):
+        rows = self._rows(op)
+        for u, row in rows:
+            for column, mutator, value in self._resolve(op["mutations"], named):
+                kind = COLUMNS[op["table"]].get(column)
+                if kind == "set":
+                    items = row[column][1]
+                    for v in _elements(value):
+                        if mutator == "insert" and v not in items:
+                            items.append(v)
+                        elif mutator == "delete" and v in items:
+                            items.remove(v)
+                elif kind == "map":
+                    pairs = row[column][1]
+                    if mutator == "insert":
+                        keys = [k for k, v in pairs]
+                        pairs.extend(p for p in value[1] if p[0] not in keys)
+                    elif value[0] == "map":
+                        row[column][1] = [p for p in pairs if p not in value[1]]
+                    else:
+                        row[column][1] = [p for p in pairs if p[0] not in value[1]]
+                else:
+                    raise OvsdbError("constraint violation", "cannot mutate {}".format(column))
+        return {"count": len(rows)}
+
+    def _delete(self, op, named):
+        rows = self._rows(op)
+        for u, row in rows:
+            del self.tables[op["table"]][u]
+        return {"count": len(rows)}
+
+    def _wait(self, op, named):
+        rows = [dict((c, r[c]) for c in op["columns"]) for u, r in self._rows(op)]
+        if (rows == op["rows"]) != (op["until"] == "=="):
+            raise OvsdbError("timed out", "wait on {}".format(op["table"]))
+        return {}
+
+    def _collect(self):
+        reached = {"Open_vSwitch": set(self.tables["Open_vSwitch"])}
+        for table, column, target in REFERENCES:
+            reached[target] = set()
+            for u in reached[table]:
+                for ref in _elements(self.tables[table][u][column]):
+                    reached[target].add(ref[1])
+        for table in ("Bridge", "Port", "Interface"):
+            for u in list(self.tables[table]):
+                if u not in reached[table]:
+                    del self.tables[table][u]
+
+
+def _eventually(fn, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not fn() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return fn()
+
+
+class TransactionTest(unittest.TestCase):
+    """
+    The Transaction surface and the read helpers, answered by the replica.
+    """
+    MONITOR = True
+
+    def setUp(self):
+        self.server = StandInServer()
+        self.server.transact(ovsdb.Transaction().add_bridge("br1").ops)
+        ovsdb.connect(self.server.path, monitor=self.MONITOR)
+
+    def tearDown(self):
+        ovsdb._client.close()
+        self.server.stop()
+
+    def test_add_bridge_and_ports(self):
+        tx = ovsdb.Transaction()
+        tx.add_bridge("br2")
+        tx.add_port("br2", "p1")
+        tx.add_port_patch("br2", "p2", 5, "p3")
+        tx.commit()
+        self.assertEqual(ovsdb.list_bridges(), ["br1", "br2"])
+        self.assertEqual(ovsdb.get_ports("br2"), ["p1", "p2"])
+        self.assertEqual(ovsdb.port_to_br("p2"), "br2")
+        ifaces = dict((r["name"], r) for r in ovsdb.get_tables()["Interface"])
+        self.assertEqual(ifaces["p2"]["type"], "patch")
+        self.assertEqual(ifaces["p2"]["ofport_request"], 5)
+        self.assertEqual(ifaces["p2"]["options"], ["map", [["peer", "p3"]]])
+
+    def test_set_peer_port_replaces_the_peer(self):
+        ovsdb.add_port_patch("br1", "p1", 1, "a")
+        ovsdb.set_peer_port("p1", "b")
+        ifaces = dict((r["name"], r) for r in ovsdb.get_tables()["Interface"])
+        self.assertEqual(ifaces["p1"]["options"], ["map", [["peer", "b"]]])
+
+    def test_vlans(self):
+        ovsdb.add_port("br1", "p1")
+        ovsdb.set_vlan_port("p1", 100)
+        self.assertEqual(ovsdb.get_tag_port("p1"), "100")
+        ovsdb.clear_vlan_port("p1")
+        self.assertEqual(ovsdb.get_tag_port("p1"), "[]")
+        self.assertFalse(ovsdb.is_trunk("p1"))
+        tx = ovsdb.Transaction()
+        tx.add_trunk_tag("p1", 200)
+        tx.add_trunk_tag("p1", 300)
+        tx.rem_trunk_tag("p1", 200)
+        tx.commit()
+        self.assertEqual(ovsdb.get_trunks_port("p1"), [300])
+        self.assertTrue(ovsdb.is_trunk("p1"))
+
+    def test_del_port_collects_the_rows(self):
+        ovsdb.add_port("br1", "p1")
+        ovsdb.del_port("br1", "p1")
+        self.assertEqual(ovsdb.get_ports("br1"), [])
+        self.assertNotIn("p1", [r["name"] for r in ovsdb.get_tables()["Port"]])
+
+    def test_missing_row_fails_the_whole_transaction(self):
+        tx = ovsdb.Transaction()
+        tx.add_bridge("br2")
+        tx.set_vlan_port("p9", 100)
+        with self.assertRaisesRegex(RuntimeError, "no row \"p9\" in table Port"):
+            tx.commit()
+        self.assertEqual(ovsdb.list_bridges(), ["br1"])
+
+    def test_missing_bridge(self):
+        with self.assertRaises(RuntimeError):
+            ovsdb.add_port("br9", "p1")
+        self.assertFalse(ovsdb.exist_bridge("br9"))
+
+
+class SelectTest(TransactionTest):
+    """
+    The same surface without a replica, every read is a select.
+    """
+    MONITOR = False
+
+
+class ReplicaTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandInServer()
+        self.server.transact(ovsdb.Transaction().add_bridge("br1").ops)
+        ovsdb.connect(self.server.path)
+
+    def tearDown(self):
+        ovsdb._client.close()
+        self.server.stop()
+
+    def external(self, tx):
+        # a write by another ovsdb client
+        self.server.transact(tx.ops)
+
+    def test_updates_of_other_clients(self):
+        self.external(ovsdb.Transaction().add_bridge("br2").add_port("br2", "p1"))
+        self.assertTrue(_eventually(lambda: ovsdb.list_bridges() == ["br1", "br2"]))
+        self.assertEqual(ovsdb.get_ports("br2"), ["p1"])
+        self.external(ovsdb.Transaction().set_vlan_port("p1", 100))
+        self.assertTrue(_eventually(lambda: ovsdb.get_tag_port("p1") == "100"))
+
+    def test_reads_reconnect_after_a_disconnect(self):
+        self.server.drop()
+        self.assertTrue(_eventually(lambda: ovsdb._client.sock is None))
+        # missed by the replica while it was disconnected
+        self.external(ovsdb.Transaction().add_bridge("br2"))
+        self.assertEqual(ovsdb.list_bridges(), ["br1", "br2"])
+
+    def test_monitor_is_registered_again(self):
+        self.server.drop()
+        self.assertTrue(_eventually(lambda: ovsdb._client.sock is None))
+        self.assertEqual(ovsdb.list_bridges(), ["br1"])
+        self.assertEqual(len(self.server.monitors), 1)
+        self.external(ovsdb.Transaction().add_bridge("br2"))
+        self.assertTrue(_eventually(lambda: ovsdb.list_bridges() == ["br1", "br2"]))
+
+    def test_reads_fail_without_ovsdb(self):
+        self.server.stop()
+        self.assertTrue(_eventually(lambda: ovsdb._client.sock is None))
+        with self.assertRaises(RuntimeError):
+            ovsdb.list_bridges()
+
+
+if __name__ == '__main__':
+    unittest.main()
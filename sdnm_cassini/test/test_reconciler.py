@@ -0,0 +1,109 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import unittest
+
+from sdnm_cassini.simswitch import SimulatedSwitch
+
+try:
+    import sysrepo as sr
+    from sdnm_cassini.reconciler import Reconciler
+except ImportError:
+    sr = None
+
+
+def _patch(peer="none", ofport=None, tag=None):
+    return {"type": "patch", "peer": peer, "ofport": ofport, "tag": tag}
+
+
+def desired():
+    return {
+        "xe1": {"xe1/1": _patch("oe1/1", 1), "xe1/2": _patch("none", 2)},
+        "oe1": {"oe1/1": _patch("xe1/1", 11, 100)},
+    }
+
+
+@unittest.skipIf(sr is None, "sysrepo is not installed")
+class ReconcilerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sw = SimulatedSwitch()
+        tx = self.sw.Transaction()
+        tx.add_bridge("xe1")
+        tx.add_bridge("oe1")
+        tx.add_port_patch("xe1", "xe1/1", 1, "oe1/1")
+        tx.add_port_patch("xe1", "xe1/2", 2, "none")
+        tx.add_port_patch("oe1", "oe1/1", 11, "xe1/1")
+        tx.set_vlan_port("oe1/1", 100)
+        # the uplink is attached from outside
+        tx.add_port("oe1", "uplink")
+        tx.commit()
+        self.rec = Reconciler(None, self.sw)
+
+    def converge(self, want):
+        ops = self.rec.diff(want, self.rec.actual_state())
+        self.rec.apply(ops)
+        self.assertEqual(self.rec.diff(want, self.rec.actual_state()), [])
+        return ops
+
+    def test_actual_state(self):
+        actual = self.rec.actual_state()
+        self.assertEqual(sorted(actual), ["oe1", "xe1"])
+        self.assertEqual(actual["xe1"], desired()["xe1"])
+        self.assertEqual(actual["oe1"]["oe1/1"], _patch("xe1/1", 11, 100))
+        self.assertNotEqual(actual["oe1"]["uplink"]["type"], "patch")
+
+    def test_nothing_to_do_in_sync(self):
+        self.assertEqual(self.rec.diff(desired(), self.rec.actual_state()), [])
+
+    def test_missing_port_is_added(self):
+        want = desired()
+        want["xe1"]["xe1/3"] = _patch("none", 3)
+        want["oe1"]["oe1/2"] = _patch("none", 12, 200)
+        ops = self.converge(want)
+        self.assertEqual(ops, [("add_port_patch", ("oe1", "oe1/2", 12, "none")), ("set_vlan_port", ("oe1/2", 200)),
+                               ("add_port_patch", ("xe1", "xe1/3", 3, "none"))])
+
+    def test_wrong_peer_and_vlan_are_corrected(self):
+        self.sw.Transaction().set_peer_port("xe1/1", "none").set_vlan_port("oe1/1", 300).commit()
+        ops = self.converge(desired())
+        self.assertEqual(ops, [("set_vlan_port", ("oe1/1", 100)), ("set_peer_port", ("xe1/1", "oe1/1"))])
+        self.sw.clear_vlan_port("oe1/1")
+        self.assertEqual(self.converge(desired()), [("set_vlan_port", ("oe1/1", 100))])
+
+    def test_only_patch_ports_are_deleted(self):
+        self.sw.add_port_patch("oe1", "oe1/9", 19, "none")
+        ops = self.converge(desired())
+        self.assertEqual(ops, [("del_port", ("oe1", "oe1/9"))])
+        self.assertIn("uplink", self.sw.get_ports("oe1"))
+
+    def test_split_groups_per_bridge(self):
+        want = desired()
+        # oe1/1 moves to a new bridge
+        del want["oe1"]["oe1/1"]
+        want["oe2"] = {"oe1/1": _patch("xe1/1", 11, 100)}
+        want["xe1"]["xe1/2"] = _patch("none", 5)
+        ops = self.rec.diff(want, self.rec.actual_state())
+        groups = self.rec.split(ops, want)
+        self.assertEqual(sorted(groups), ["oe2", "xe1"])
+        self.assertEqual(groups["oe2"], [("del_port", ("oe1", "oe1/1")), ("add_bridge", ("oe2",)),
+                                         ("add_port_patch", ("oe2", "oe1/1", 11, "xe1/1")),
+                                         ("set_vlan_port", ("oe1/1", 100))])
+        self.assertEqual(groups["xe1"], [("set_port_num", ("xe1/2", 5))])
+
+
+if __name__ == '__main__':
+    unittest.main()
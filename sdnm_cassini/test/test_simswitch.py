@@ -0,0 +1,79 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import copy
+import unittest
+
+from sdnm_cassini.simswitch import SimulatedSwitch
+
+
+class RollbackTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sw = SimulatedSwitch()
+        tx = self.sw.Transaction()
+        tx.add_bridge("br1")
+        tx.add_port_patch("br1", "p1", 1, "p2")
+        tx.add_port_patch("br1", "p2", 2, "p1")
+        tx.set_vlan_port("p1", 100)
+        tx.set_trunk_port("p2", [100, 200])
+        tx.commit()
+        self.sw.reset_stats()
+        self.before = self.state()
+
+    def state(self):
+        return copy.deepcopy((self.sw.bridges, self.sw.ports, self.sw.ifaces))
+
+    def fails(self, tx):
+        with self.assertRaises(RuntimeError):
+            tx.commit()
+        self.assertEqual(self.state(), self.before)
+        self.assertEqual((self.sw.commits, self.sw.errors), (0, 1))
+        self.assertEqual(self.sw.log, [])
+
+    def test_vlan_out_of_range_on_the_last_op(self):
+        tx = self.sw.Transaction()
+        tx.add_bridge("br2")
+        tx.add_port("br2", "p3")
+        tx.set_vlan_port("p1", 200)
+        tx.set_peer_port("p2", "p3")
+        tx.add_trunk_tag("p2", 300)
+        tx.set_vlan_port("p3", 5000)
+        self.fails(tx)
+
+    def test_bad_ofport_halfway_through_a_patch_port(self):
+        tx = self.sw.Transaction()
+        tx.clear_vlan_port("p1")
+        tx.del_port("br1", "p2")
+        tx.add_port_patch("br1", "p3", 0, "p1")
+        self.fails(tx)
+
+    def test_deleted_bridge_comes_back(self):
+        tx = self.sw.Transaction()
+        tx.del_bridge("br1")
+        tx.add_bridge("br1")
+        tx.set_port_num("br1", 70000)
+        self.fails(tx)
+
+    def test_switch_takes_the_next_transaction(self):
+        self.fails(self.sw.Transaction().set_vlan_port("p1", 200).set_vlan_port("p9", 300))
+        self.sw.Transaction().set_vlan_port("p1", 200).commit()
+        self.assertEqual(self.sw.get_tag_port("p1"), "200")
+        self.assertEqual(self.sw.commits, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import unittest
+
+try:
+    import sysrepo as sr
+    import sdnm_cassini.terminal_device as td
+except ImportError:
+    sr = None
+
+
+class RecordingSession(object):
+    # a datastore without data that keeps the xpaths it was asked for
+
+    def __init__(self):
+        self.queries = []
+
+    def get_items_iter(self, xpath):
+        self.queries.append(xpath)
+        return None
+
+
+@unittest.skipIf(sr is None, "sysrepo is not installed")
+class BatchTest(unittest.TestCase):
+
+    def test_few_indices_are_read_by_key(self):
+        sess = RecordingSession()
+        self.assertEqual(td.get_config_descriptions(sess, [2, "1", 2]), {})
+        self.assertEqual(sess.queries, ["{}[index='1']/config/description".format(td.CHANNEL_LIST),
+                                        "{}[index='2']/config/description".format(td.CHANNEL_LIST)])
+
+    def test_many_indices_are_one_query(self):
+        sess = RecordingSession()
+        td.get_ing_config_transceivers(sess, range(td.BATCH_KEYED + 1))
+        self.assertEqual(sess.queries, ["{}/ingress/config/transceiver".format(td.CHANNEL_LIST)])
+
+    def test_every_channel_is_one_query(self):
+        sess = RecordingSession()
+        td.get_lch_config_logical_channels(sess)
+        self.assertEqual(len(sess.queries), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import unittest
+
+from sdnm_cassini.simswitch import SimulatedSwitch
+from sdnm_cassini.trunks import IDLE_VLAN, TrunkIndex
+
+
+class TrunkIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sw = SimulatedSwitch()
+        tx = self.sw.Transaction()
+        tx.add_bridge("br1")
+        for port in ("trunk", "p1", "p2"):
+            tx.add_port("br1", port)
+        tx.set_vlan_port("p1", 100)
+        tx.set_vlan_port("p2", 100)
+        # 999 is left over from a port that is gone
+        tx.set_trunk_port("trunk", [100, 999])
+        tx.commit()
+        self.index = TrunkIndex(self.sw)
+
+    def retune(self, port, old, new):
+        tx = self.sw.Transaction()
+        if new is None:
+            tx.clear_vlan_port(port)
+        else:
+            tx.set_vlan_port(port, new)
+        tx.commit()
+        self.index.update("br1", add=new, remove=old)
+
+    def test_first_update_syncs_the_trunks_column(self):
+        self.retune("p1", None, 100)
+        self.assertEqual(self.sw.get_trunks_port("trunk"), [100])
+        self.assertEqual(self.index.tags("br1"), [100])
+
+    def test_shared_tag_is_kept_until_its_last_port(self):
+        self.retune("p1", 100, 200)
+        self.assertEqual(self.sw.get_trunks_port("trunk"), [100, 200])
+        self.retune("p2", 100, None)
+        self.assertEqual(self.sw.get_trunks_port("trunk"), [200])
+
+    def test_retunes_keep_the_trunk_in_line(self):
+        tag = 100
+        for new in (130, 150, 160, None, 170):
+            self.retune("p1", tag, new)
+            tag = new
+            want = sorted(set([100, tag]) - {None})
+            self.assertEqual(self.sw.get_trunks_port("trunk"), want)
+
+    def test_unchanged_tag_is_not_written(self):
+        self.retune("p1", None, 100)
+        commits = self.sw.commits
+        self.index.update("br1", add=100, remove=100)
+        self.assertEqual(self.sw.commits, commits)
+
+    def test_reconcile_rewrites_the_column(self):
+        self.index.update_trunk_port("br1")
+        self.assertEqual(self.sw.get_trunks_port("trunk"), [100])
+        self.retune("p2", 100, 300)
+        self.assertEqual(self.sw.get_trunks_port("trunk"), [100, 300])
+
+    def test_invalidate_discovers_the_bridge_again(self):
+        self.retune("p1", None, 100)
+        self.sw.Transaction().set_vlan_port("p2", 400).commit()
+        self.index.invalidate_trunks("br1")
+        self.index.update("br1", add=400, remove=100)
+        self.assertEqual(self.sw.get_trunks_port("trunk"), [100, 400])
+
+    def test_last_tag_leaves_the_idle_vlan(self):
+        self.retune("p1", 100, None)
+        self.retune("p2", 100, None)
+        self.assertEqual(self.sw.get_trunks_port("trunk"), [IDLE_VLAN])
+
+    def test_remove_last_tag_invalidate_add_tag(self):
+        self.retune("p1", 100, None)
+        self.retune("p2", 100, None)
+        self.index.invalidate_trunks("br1")
+        self.retune("p1", None, 300)
+        self.assertEqual(self.sw.get_trunks_port("trunk"), [300])
+        self.assertEqual(self.index.tags("br1"), [300])
+
+    def test_reconcile_without_tags(self):
+        tx = self.sw.Transaction()
+        tx.clear_vlan_port("p1")
+        tx.clear_vlan_port("p2")
+        tx.commit()
+        self.index.update_trunk_port("br1")
+        self.assertEqual(self.sw.get_trunks_port("trunk"), [IDLE_VLAN])
+
+    def test_bridge_without_trunk(self):
+        self.sw.add_bridge("br2")
+        self.sw.add_port("br2", "p3")
+        self.index.update("br2", add=100)
+        self.assertEqual(self.index.tags("br2"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
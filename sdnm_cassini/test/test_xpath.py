@@ -0,0 +1,64 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import unittest
+
+try:
+    import sysrepo as sr
+    from sdnm_cassini.xpath import parse_xpath
+except ImportError:
+    sr = None
+
+FREQUENCY = ("/openconfig-platform:components/component[name='{}']/"
+             "openconfig-terminal-device:optical-channel/config/frequency")
+
+
+@unittest.skipIf(sr is None, "sysrepo is not installed")
+class ParseXPathTest(unittest.TestCase):
+
+    def test_module_prefixes(self):
+        path = parse_xpath(FREQUENCY.format("oe1/1"))
+        self.assertEqual(path.module, "openconfig-platform")
+        self.assertEqual(path.segments, ("components", "component", "optical-channel", "config", "frequency"))
+        self.assertEqual(path.leaf, "frequency")
+        self.assertEqual(path.schema, "/openconfig-platform:components/component/optical-channel/config/frequency")
+
+    def test_quoted_values_with_slash_and_bracket(self):
+        self.assertEqual(parse_xpath(FREQUENCY.format("oe1/1")).keys["component"], "oe1/1")
+        self.assertEqual(parse_xpath(FREQUENCY.format("a]b/c")).keys["component"], "a]b/c")
+        path = parse_xpath("/m:a/b[name=\"x'/]y\"]/c")
+        self.assertEqual(dict(path.keys), {"b": "x'/]y"})
+        self.assertEqual(path.segments, ("a", "b", "c"))
+
+    def test_multiple_keys(self):
+        path = parse_xpath("/m:a/b[k1='1'][k2='a]b']/c[k='/']/d")
+        self.assertEqual(dict(path.keys), {"b": ("1", "a]b"), "c": "/"})
+        self.assertEqual(path.schema, "/m:a/b/c/d")
+
+    def test_not_a_data_path(self):
+        self.assertIsNone(parse_xpath("a/b"))
+        self.assertIsNone(parse_xpath("/a/b"))
+        self.assertIsNone(parse_xpath("/m:a/b[k='1"))
+
+    def test_keys_are_read_only(self):
+        x = FREQUENCY.format("oe1/2")
+        with self.assertRaises(TypeError):
+            parse_xpath(x).keys["component"] = "other"
+        self.assertEqual(parse_xpath(x).keys["component"], "oe1/2")
+
+
+if __name__ == '__main__':
+    unittest.main()
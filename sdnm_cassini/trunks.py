@@ -0,0 +1,191 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+import threading
+
+# An empty trunks column makes OVS trunk every VLAN, and is_trunk no longer
+# finds the port, so a trunk without tags keeps this reserved VLAN instead.
+# Frequencies never map to it.
+IDLE_VLAN = 4095
+
+
+def _tag(tag):
+    if tag is None:
+        return None
+    t = "{}".format(tag).strip()
+    if t == "[]" or t == "0":
+        return None
+    return int(t)
+
+
+def get_trunk_ports(backend, br):
+    for i in backend.get_ports(br):
+        if backend.is_trunk(i):
+            return i
+    raise RuntimeWarning("there are not trunk ports")
+
+
+def get_tags_br(backend, br):
+    tags = []
+    for port in backend.get_ports(br):
+        if not backend.is_trunk(port):
+            tags.append(backend.get_tag_port(port).replace("\n", ""))
+
+    if len(tags) == 0:
+        raise RuntimeWarning("there are is not tagged ports")
+    return tags
+
+
+class TrunkIndex(object):
+    """
+    Per-bridge index of the VLANs carried by the trunk port.
+
+    Every tag is reference counted by the number of access ports using it, so
+    only the first user of a VLAN inserts it in the trunks column and only the
+    last one removes it. A bridge is discovered from the switch the first time
+    it is used, or again after invalidate(), together with the trunks column
+    as it is, and writes are the difference between the two.
+
+    A trunk without access port tags carries IDLE_VLAN only, never an empty
+    column.
+
+    update() is called once the port tags were written, so a bridge discovered
+    by it already counts add and no longer remove: its first update only brings
+    the trunks column in line with the tags.
+
+    backend is any object with the ovsctl reads get_ports, is_trunk,
+    get_tag_port and get_trunks_port and with Transaction(); the trunk calls of the backend surface
+    (get_trunk_ports, get_tags_br, update_trunk_port and invalidate_trunks) are
+    the methods of the same name.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.bridges = {}
+        self.lock = threading.Lock()
+
+    def get_trunk_ports(self, br):
+        return get_trunk_ports(self.backend, br)
+
+    def get_tags_br(self, br):
+        return get_tags_br(self.backend, br)
+
+    def update_trunk_port(self, br, add=None, remove=None):
+        if add is None and remove is None:
+            self.reconcile(br)
+        else:
+            self.update(br, add, remove)
+
+    def invalidate_trunks(self, br=None):
+        self.invalidate(br)
+
+    def discover(self, br):
+        """
+        Returns (trunk, tags, trunks), the trunk port, the tags of the access
+        ports and the VLANs in the trunks column.
+        """
+        try:
+            trunk = self.get_trunk_ports(br)
+        except RuntimeWarning:
+            return None, [], []
+        try:
+            tags = self.get_tags_br(br)
+        except RuntimeWarning:
+            tags = []
+        return trunk, tags, self.backend.get_trunks_port(trunk)
+
+    def rewrite(self, trunk, tags):
+        return self.backend.Transaction().set_trunk_port(trunk, tags).commit()
+
+    def mutate(self, trunk, add, remove):
+        tx = self.backend.Transaction()
+        for t in remove:
+            tx.rem_trunk_tag(trunk, t)
+        for t in add:
+            tx.add_trunk_tag(trunk, t)
+        return tx.commit()
+
+    def _load(self, br):
+        trunk, tags, trunks = self.discover(br)
+        count = {}
+        for t in tags:
+            t = _tag(t)
+            if t is not None:
+                count[t] = count.get(t, 0) + 1
+        installed = set(_tag(t) for t in trunks) - {None}
+        entry = [trunk, count, installed]
+        self.bridges[br] = entry
+        return entry
+
+    def _entry(self, br):
+        entry = self.bridges.get(br)
+        if entry is None:
+            entry = self._load(br)
+        return entry
+
+    def _sync(self, br, entry):
+        trunk, count, installed = entry
+        if trunk is None:
+            return
+        want = set(count) or {IDLE_VLAN}
+        ins = sorted(want - installed)
+        rem = sorted(installed - want)
+        if len(ins) > 0 or len(rem) > 0:
+            try:
+                self.mutate(trunk, ins, rem)
+            except Exception:
+                del self.bridges[br]
+                raise
+            entry[2] = want
+
+    def reconcile(self, br):
+        with self.lock:
+            trunk, count, installed = self._load(br)
+            if trunk is not None:
+                want = set(count) or {IDLE_VLAN}
+                self.rewrite(trunk, ["{}".format(t) for t in sorted(want)])
+                self.bridges[br][2] = want
+
+    def update(self, br, add=None, remove=None):
+        add = _tag(add)
+        remove = _tag(remove)
+        if add == remove:
+            return
+        with self.lock:
+            entry = self.bridges.get(br)
+            if entry is None:
+                # discovered from the tags already written
+                entry = self._load(br)
+            else:
+                count = entry[1]
+                if remove is not None and remove in count:
+                    count[remove] -= 1
+                    if count[remove] == 0:
+                        del count[remove]
+                if add is not None:
+                    count[add] = count.get(add, 0) + 1
+            self._sync(br, entry)
+
+    def tags(self, br):
+        with self.lock:
+            return sorted(self._entry(br)[1])
+
+    def invalidate(self, br=None):
+        with self.lock:
+            if br is None:
+                self.bridges.clear()
+            else:
+                self.bridges.pop(br, None)
@@ -14,26 +14,72 @@
 #  limitations under the License.                                              +
 # ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
+import sysrepo as sr
+
+# sr.Val type to the name of its sr.Data accessor
+ACCESSORS = {
+    sr.SR_STRING_T: "get_string",
+    sr.SR_ENUM_T: "get_enum",
+    sr.SR_IDENTITYREF_T: "get_identityref",
+    sr.SR_BOOL_T: "get_bool",
+    sr.SR_DECIMAL64_T: "get_decimal64",
+    sr.SR_INT8_T: "get_int8",
+    sr.SR_INT16_T: "get_int16",
+    sr.SR_INT32_T: "get_int32",
+    sr.SR_INT64_T: "get_int64",
+    sr.SR_UINT8_T: "get_uint8",
+    sr.SR_UINT16_T: "get_uint16",
+    sr.SR_UINT32_T: "get_uint32",
+    sr.SR_UINT64_T: "get_uint64",
+}
+
+
+def value_of(val):
+    """
+    Python scalar of a sr.Val, None for nodes without a value (containers,
+    lists, empty leaves).
+    """
+    if val is None:
+        return None
+    accessor = ACCESSORS.get(val.type())
+    if accessor is None:
+        return None
+    return getattr(val.data(), accessor)()
+
+
+def iter_items(session, xpath):
+    """
+    Yields the sr.Val of every node matched by xpath, read one at a time from
+    the datastore instead of loading the whole result.
+    """
+    it = session.get_items_iter(xpath)
+    if it is None:
+        return
+    while True:
+        value = session.get_item_next(it)
+        if value is None:
+            break
+        yield value
+
+
+def iter_query(session, xpath):
+    for value in iter_items(session, xpath):
+        yield value_of(value)
+
+
 def make_query(session, xpath, multi=False):
+    """
+    Returns the value of the leaf at xpath, or the list of values of every leaf
+    matched when multi is set, as Python scalars.
+    """
     def query_item():
-        values = session.get_item(xpath)
-        if values is None:
+        value = session.get_item(xpath)
+        if value is None:
             return None
-        ret = []
-        ret.append(values.to_string().rstrip("\n"))
-        return ret.copy()
+        return value_of(value)
 
     def query_items():
-        values = session.get_items(xpath)
-        if values is None:
-            raise RuntimeError("Query Error or None")
-        ret = []
-        for i in range(values.val_cnt()):
-            v = values.val(i)
-            s = v.to_string().rstrip("\n")
-            ret.append(s)
-
-        return ret.copy()
+        return list(iter_query(session, xpath))
 
     if multi:
         return query_items()
@@ -42,8 +88,8 @@ def make_query(session, xpath, multi=False):
 
 
 def convert_freq_vlan(freq):
-    if freq is "0":
-        return "0"
     f = int(freq)
+    if f == 0:
+        return 0
     v = (f * 0.0001 - 19000)
-    return (int(v))
\ No newline at end of file
+    return (int(v))
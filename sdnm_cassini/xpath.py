@@ -0,0 +1,93 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+"""
+Parser of the data XPaths reported by sysrepo.
+
+An XPath such as
+
+    /openconfig-platform:components/component[name='oe1/1']/
+        openconfig-terminal-device:optical-channel/config/frequency
+
+is split into its module, the node names without prefixes, the list keys by
+list name, the leaf and the schema node path used to route changes. Key values
+are read as quoted strings, so names with "/" in them do not break the split.
+"""
+
+import re
+from collections import namedtuple
+from functools import lru_cache
+from types import MappingProxyType
+
+from sdnm_cassini.utils import value_of
+
+_SEGMENT = re.compile(r"/(?:([\w.-]+):)?([\w.-]+)((?:\[[^=\]]+=(?:'[^']*'|\"[^\"]*\")\])*)")
+_PREDICATE = re.compile(r"\[([^=\]]+)=(?:'([^']*)'|\"([^\"]*)\")\]")
+
+XPath = namedtuple("XPath", ["module", "segments", "keys", "leaf", "schema"])
+
+Change = namedtuple("Change", ["oper", "xpath", "module", "segments", "keys", "leaf", "schema", "old", "new"])
+
+
+@lru_cache(maxsize=4096)
+def parse_xpath(xpath):
+    """
+    Returns the XPath record of xpath, or None if it is not a data path. Lists
+    with a single key map to its value in keys, the others to a tuple. The
+    record is shared by the callers through the cache, so keys is read-only.
+    """
+    module = None
+    segments = []
+    keys = {}
+    pos = 0
+    while pos < len(xpath):
+        m = _SEGMENT.match(xpath, pos)
+        if m is None:
+            return None
+        if module is None:
+            module = m.group(1)
+        name = m.group(2)
+        segments.append(name)
+        if m.group(3):
+            values = tuple(p[1] if p[1] or not p[2] else p[2] for p in _PREDICATE.findall(m.group(3)))
+            keys[name] = values[0] if len(values) == 1 else values
+        pos = m.end()
+    if module is None:
+        return None
+    return XPath(module, tuple(segments), MappingProxyType(keys), segments[-1], schema_path(module, segments))
+
+
+def schema_path(module, segments):
+    """
+    Schema node path of a data path, without keys and inner prefixes, e.g.
+    /openconfig-platform:components/component/optical-channel/config/frequency
+    """
+    return "/{}:{}".format(module, "/".join(segments))
+
+
+def parse_change(change):
+    """
+    Returns the Change record of a sr.Change, with the old and new values
+    decoded to Python scalars, or None for paths that cannot be parsed.
+    """
+    old = change.old_val()
+    new = change.new_val()
+    xpath = (old if new is None else new).xpath()
+    path = parse_xpath(xpath)
+    if path is None:
+        return None
+    return Change(change.oper(), xpath, path.module, path.segments, path.keys, path.leaf, path.schema,
+                  value_of(old), value_of(new))
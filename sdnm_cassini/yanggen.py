@@ -0,0 +1,429 @@
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+"""
+Generator of sdnm_cassini/accessors.py from the OpenConfig YANG modules.
+
+Only the YANG needed to lay out the data tree is understood: modules, imports,
+groupings and uses, typedefs, containers, lists, leaves, choices and top-level
+augments. For every leaf below the containers named in TARGETS it emits the
+XPath template and a getter that decodes the value with the sr.Data accessor of
+the leaf base type, plus one decoder and one bulk reader per target list.
+
+    python -m sdnm_cassini.yanggen [yang dir] [output file]
+"""
+
+import os
+import re
+import sys
+from collections import OrderedDict, namedtuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+YANG_DIR = os.path.join(HERE, "..", "docker", "odtn", "yang", "openconfig-odtn")
+OUTPUT = os.path.join(HERE, "accessors.py")
+
+# accessor prefix, list path and the containers read below each list entry
+TARGETS = (
+    ("channel", "/terminal-device/logical-channels/channel", ("config", "ingress/config")),
+    ("assignment", "/terminal-device/logical-channels/channel/logical-channel-assignments/assignment", ("config",)),
+    ("component", "/components/component", ("config", "state", "optical-channel/config")),
+)
+
+# YANG base type to sr.Data accessor, the others are decoded by utils.value_of
+ACCESSORS = {
+    "string": "get_string",
+    "enumeration": "get_enum",
+    "identityref": "get_identityref",
+    "boolean": "get_bool",
+    "decimal64": "get_decimal64",
+    "int8": "get_int8",
+    "int16": "get_int16",
+    "int32": "get_int32",
+    "int64": "get_int64",
+    "uint8": "get_uint8",
+    "uint16": "get_uint16",
+    "uint32": "get_uint32",
+    "uint64": "get_uint64",
+}
+
+BUILTINS = set(ACCESSORS) | {"binary", "bits", "empty", "instance-identifier", "leafref", "union"}
+
+INTEGERS = ("int8", "int16", "int32", "int64", "uint8", "uint16", "uint32", "uint64")
+
+Stmt = namedtuple("Stmt", ["keyword", "arg", "children"])
+
+
+def _tokens(text):
+    tokens = []
+    i = 0
+    n = len(text)
+    while i < n:
+        c = text[i]
+        if c.isspace():
+            i += 1
+        elif text.startswith("//", i):
+            i = text.find("\n", i)
+            if i < 0:
+                break
+        elif text.startswith("/*", i):
+            i = text.index("*/", i) + 2
+        elif c in "{};":
+            tokens.append(("sym", c))
+            i += 1
+        elif c in "\"'":
+            j = i + 1
+            buf = []
+            while text[j] != c:
+                if c == "\"" and text[j] == "\\":
+                    j += 1
+                buf.append(text[j])
+                j += 1
+            tokens.append(("str", "".join(buf)))
+            i = j + 1
+        else:
+            j = i
+            while j < n and not text[j].isspace() and text[j] not in "{};":
+                j += 1
+            tokens.append(("word", text[i:j]))
+            i = j
+    return tokens
+
+
+def _parse(tokens, pos=0):
+    stmts = []
+    while pos < len(tokens):
+        kind, keyword = tokens[pos]
+        if kind == "sym" and keyword == "}":
+            return stmts, pos + 1
+        pos += 1
+        arg = None
+        if tokens[pos][0] != "sym":
+            arg = tokens[pos][1]
+            pos += 1
+            while tokens[pos] == ("word", "+"):
+                arg += tokens[pos + 1][1]
+                pos += 2
+        children = []
+        if tokens[pos][1] == "{":
+            children, pos = _parse(tokens, pos + 1)
+        else:
+            pos += 1
+        stmts.append(Stmt(keyword, arg, children))
+    return stmts, pos
+
+
+def parse(text):
+    return _parse(_tokens(text))[0]
+
+
+def _find(stmt, keyword):
+    for s in stmt.children:
+        if s.keyword == keyword:
+            return s
+    return None
+
+
+def _arg(stmt, keyword):
+    s = _find(stmt, keyword)
+    return None if s is None else s.arg
+
+
+class Module(object):
+
+    def __init__(self, stmt):
+        self.name = stmt.arg
+        self.stmt = stmt
+        self.prefix = _arg(stmt, "prefix")
+        self.imports = {self.prefix: self.name}
+        self.groupings = {}
+        self.typedefs = {}
+        for s in stmt.children:
+            if s.keyword == "import":
+                self.imports[_arg(s, "prefix")] = s.arg
+            elif s.keyword == "grouping":
+                self.groupings[s.arg] = s
+            elif s.keyword == "typedef":
+                self.typedefs[s.arg] = s
+
+
+class Node(object):
+
+    def __init__(self, kind, name, ns, config, parent=None):
+        self.kind = kind
+        self.name = name
+        self.ns = ns
+        self.config = config
+        self.parent = parent
+        self.children = OrderedDict()
+        self.keys = []
+        self.type = None
+
+
+class Schema(object):
+
+    def __init__(self, path):
+        self.modules = {}
+        for name in sorted(os.listdir(path)):
+            if not name.endswith(".yang"):
+                continue
+            with open(os.path.join(path, name)) as f:
+                for stmt in parse(f.read()):
+                    if stmt.keyword == "module":
+                        self.modules[stmt.arg] = Module(stmt)
+        self.root = Node("root", None, None, True)
+        for mod in self.modules.values():
+            self._expand(mod, mod.name, mod.stmt.children, self.root, True)
+        self._augment()
+
+    def _ref(self, mod, name):
+        if ":" in name:
+            prefix, name = name.split(":", 1)
+            return self.modules[mod.imports[prefix]], name
+        return mod, name
+
+    def _expand(self, mod, ns, stmts, parent, config):
+        for s in stmts:
+            if s.keyword in ("container", "list", "leaf", "leaf-list"):
+                node = Node(s.keyword, s.arg, ns, config and _arg(s, "config") != "false", parent)
+                if s.keyword == "list":
+                    node.keys = (_arg(s, "key") or "").split()
+                if s.keyword in ("leaf", "leaf-list"):
+                    node.type = self._type(mod, _find(s, "type"))
+                else:
+                    self._expand(mod, ns, s.children, node, node.config)
+                parent.children[s.arg] = node
+            elif s.keyword == "uses":
+                gmod, name = self._ref(mod, s.arg)
+                self._expand(gmod, ns, gmod.groupings[name].children, parent, config)
+            elif s.keyword in ("choice", "case"):
+                self._expand(mod, ns, s.children, parent, config)
+
+    def _augment(self):
+        pending = []
+        for mod in self.modules.values():
+            for s in mod.stmt.children:
+                if s.keyword == "augment":
+                    pending.append((mod, s))
+        # an augment can target nodes added by another one
+        while len(pending) > 0:
+            left = []
+            for mod, s in pending:
+                target = self.lookup(s.arg)
+                if target is None:
+                    left.append((mod, s))
+                else:
+                    self._expand(mod, mod.name, s.children, target, target.config)
+            if len(left) == len(pending):
+                break
+            pending = left
+
+    def _type(self, mod, stmt):
+        if stmt is None:
+            return None
+        tmod, name = self._ref(mod, stmt.arg)
+        if name in BUILTINS and tmod is mod:
+            if name == "leafref":
+                return ("leafref", _arg(stmt, "path"))
+            return name
+        typedef = tmod.typedefs.get(name)
+        if typedef is None:
+            return None
+        return self._type(tmod, _find(typedef, "type"))
+
+    def lookup(self, path, node=None):
+        if node is None or path.startswith("/"):
+            node = self.root
+        for seg in path.strip("/").split("/"):
+            if seg == "..":
+                node = node.parent
+            else:
+                node = node.children.get(seg.split(":")[-1])
+            if node is None:
+                return None
+        return node
+
+    def base_type(self, node):
+        """
+        Built-in type of a leaf, leafrefs are followed to their target.
+        """
+        t = node.type
+        seen = 0
+        while isinstance(t, tuple) and seen < 8:
+            target = self.lookup(re.sub(r"\[[^]]*\]", "", t[1]), node)
+            node = target
+            t = None if target is None else target.type
+            seen += 1
+        return t
+
+
+def _ident(path):
+    return "_".join(seg.split(":")[-1] for seg in path.split("/") if seg).replace("-", "_")
+
+
+def _xpath(schema, path):
+    """
+    Returns the XPath of path with the module prefixes where the namespace
+    changes and a key predicate template per list, and the key nodes.
+    """
+    node = schema.root
+    xpath = ""
+    keys = []
+    for seg in path.strip("/").split("/"):
+        child = node.children[seg.split(":")[-1]]
+        name = child.name if child.ns == node.ns else "{}:{}".format(child.ns, child.name)
+        xpath += "/" + name
+        if child.kind == "list":
+            xpath += "".join("[{}='{{}}']".format(k) for k in child.keys)
+            keys += [(child.name, child.children[k]) for k in child.keys]
+        node = child
+    return xpath, keys
+
+
+def _leaves(schema, target, container):
+    node = target
+    prefix = ""
+    for seg in container.split("/"):
+        child = node.children[seg]
+        prefix += child.name if child.ns == node.ns else "{}:{}".format(child.ns, child.name)
+        prefix += "/"
+        node = child
+    for leaf in node.children.values():
+        if leaf.kind == "leaf":
+            yield prefix + leaf.name, leaf
+
+
+HEADER = '''# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+#  Copyright  (c) 2020  National Network for Education and Research (RNP)      +
+#                                                                              +
+#  Licensed under the Apache License, Version 2.0 (the "License");             +
+#  you may not use this file except in compliance with the License.            +
+#  You may obtain a copy of the License at                                     +
+#                                                                              +
+#      http://www.apache.org/licenses/LICENSE-2.0                              +
+#                                                                              +
+#  Unless required by applicable law or agreed to in writing, software         +
+#  distributed under the License is distributed on an "AS IS" BASIS,           +
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.    +
+#  See the License for the specific language governing permissions and         +
+#  limitations under the License.                                              +
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+"""
+Typed accessors of the OpenConfig leaves used by the dataplane.
+
+Generated by "python -m sdnm_cassini.yanggen" from the modules in
+docker/odtn/yang/openconfig-odtn, do not edit.
+"""
+
+import re
+
+from sdnm_cassini.utils import iter_items, value_of
+
+
+def _decode(val, accessor):
+    if accessor is None:
+        return value_of(val)
+    return getattr(val.data(), accessor)()
+'''
+
+
+def generate(schema, targets=TARGETS):
+    out = [HEADER.rstrip("\n")]
+    for prefix, path, containers in targets:
+        target = schema.lookup(path)
+        xpath, keys = _xpath(schema, path)
+        const = prefix.upper()
+        params = ", ".join(name.replace("-", "_") for name, k in keys)
+        ints = [schema.base_type(k) in INTEGERS for name, k in keys]
+
+        wildcard = re.sub(r"\[[^]]*\]", "", xpath)
+        out.append("")
+        out.append("")
+        out.append("{} = \"{}\"".format(const, xpath))
+        pattern = re.escape(xpath).replace(re.escape("'{}'"), "'([^']*)'")
+        out.append("{}_ANY = \"{}\"".format(const, wildcard))
+        out.append("{0}_ALL = {0}_ANY + \"//*\"".format(const))
+        out.append("_{}_LEAF = re.compile(r\"{}(?:/(.*))?$\")".format(const, pattern))
+
+        fields = []
+        for container in containers:
+            for rel, leaf in _leaves(schema, target, container):
+                fields.append((rel, leaf))
+        out.append("{}_LEAVES = {{".format(const))
+        for rel, leaf in fields:
+            accessor = ACCESSORS.get(schema.base_type(leaf))
+            out.append("    \"{}\": (\"{}\", {}),".format(
+                rel, _ident(rel), "None" if accessor is None else "\"{}\"".format(accessor)))
+        out.append("}")
+
+        for rel, leaf in fields:
+            name = "{}_{}".format(prefix, _ident(rel))
+            base = schema.base_type(leaf)
+            accessor = ACCESSORS.get(base)
+            decode = "value_of(val)" if accessor is None else "val.data().{}()".format(accessor)
+            out.append("")
+            out.append("")
+            out.append("def get_{}(session, {}):".format(name, params))
+            out.append("    val = session.get_item(({} + \"/{}\").format({}))".format(const, rel, params))
+            out.append("    return None if val is None else {}".format(decode))
+
+        convert = []
+        for i, is_int in enumerate(ints):
+            convert.append("int(m.group({0}))".format(i + 1) if is_int else "m.group({0})".format(i + 1))
+        key = convert[0] if len(convert) == 1 else "({})".format(", ".join(convert))
+        out.append("")
+        out.append("")
+        if len(keys) == 1:
+            keyed = keys[0][1].name
+        else:
+            keyed = "({})".format(", ".join(name for name, k in keys))
+        out.append("def decode_{}(val):".format(prefix))
+        out.append("    \"\"\"")
+        out.append("    Returns (key, field, value) of a leaf of the {} entries, None for".format(target.name))
+        out.append("    the other nodes. The key is {}.".format(keyed))
+        out.append("    \"\"\"")
+        out.append("    m = _{}_LEAF.search(val.xpath())".format(const))
+        out.append("    if m is None or m.group({}) not in {}_LEAVES:".format(len(keys) + 1, const))
+        out.append("        return None")
+        out.append("    field, accessor = {}_LEAVES[m.group({})]".format(const, len(keys) + 1))
+        out.append("    return {}, field, _decode(val, accessor)".format(key))
+        out.append("")
+        out.append("")
+        out.append("def read_{0}(session, xpath={1}_ALL):".format(prefix, const))
+        out.append("    \"\"\"")
+        out.append("    Leaves of every {} matched by xpath with one streamed query, keyed by".format(target.name))
+        out.append("    {}.".format(keyed))
+        out.append("    \"\"\"")
+        out.append("    ret = {}")
+        out.append("    for v in iter_items(session, xpath):")
+        out.append("        found = decode_{}(v)".format(prefix))
+        out.append("        if found is not None:")
+        out.append("            ret.setdefault(found[0], {})[found[1]] = found[2]")
+        out.append("    return ret")
+    return "\n".join(out) + "\n"
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    path = argv[0] if len(argv) > 0 else YANG_DIR
+    output = argv[1] if len(argv) > 1 else OUTPUT
+    code = generate(Schema(path))
+    with open(output, "w") as f:
+        f.write(code)
+
+
+if __name__ == '__main__':
+    main()